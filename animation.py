@@ -0,0 +1,237 @@
+"""Server-side animations ticked together at one frame clock."""
+import time
+import uuid
+import logging
+import collections
+
+import gevent
+import gevent.event
+import numpy as np
+
+# -----------------------------------------------------------------------------
+
+
+class Animation:
+    """Effect on a range of the pixel array.
+
+    start() is called once when the animation is added, then tick() once per
+    frame until it returns False.
+    """
+
+    kind = "animation"
+
+    def __init__(self, pixel_range):
+        self.pixel_range = pixel_range
+        self.start_time = 0
+
+    def start(self, rgb, now):
+        self.start_time = now
+
+    def tick(self, rgb, now):
+        """Changes rgb for the frame at now. Returns False when finished (right
+        away unless overridden)."""
+        return False
+
+    def describe(self):
+        return {
+            "kind": self.kind,
+            "start": self.pixel_range.start,
+            "stop": self.pixel_range.stop,
+        }
+
+
+class Fade(Animation):
+    """Blends from the current colors to final_rgb in steps, delay seconds apart"""
+
+    kind = "fade"
+
+    def __init__(self, pixel_range, final_rgb, steps=1, delay=0.05):
+        super().__init__(pixel_range)
+        self.final_rgb = np.array(final_rgb, dtype=float)
+        self.steps = max(1, steps)
+        self.delay = delay
+
+    def start(self, rgb, now):
+        super().start(rgb, now)
+        self.start_rgb = np.array(rgb[self.pixel_range], dtype=float)
+        self.step_rgb = (self.final_rgb - self.start_rgb) / self.steps
+
+    def tick(self, rgb, now):
+        step = int((now - self.start_time) / self.delay) if self.delay > 0 else 0
+        if (self.delay <= 0) or (step >= self.steps):
+            rgb[self.pixel_range] = self.final_rgb
+            return False
+
+        rgb[self.pixel_range] = self.start_rgb + (step * self.step_rgb)
+        return True
+
+
+class Roll(Animation):
+    """Rolls the colors by amount, count times, delay seconds apart"""
+
+    kind = "roll"
+
+    def __init__(self, pixel_range, amount=1, count=1, delay=0.25):
+        super().__init__(pixel_range)
+        self.amount = amount
+        self.count = count
+        self.delay = delay
+        self.rolled = 0
+
+    def tick(self, rgb, now):
+        if self.delay > 0:
+            due = min(self.count, int((now - self.start_time) / self.delay) + 1)
+        else:
+            due = self.count
+
+        # Catch up on missed frames with a single roll
+        if due > self.rolled:
+            strip_rgb = rgb[self.pixel_range]
+            strip_rgb[:, :] = np.roll(
+                strip_rgb, self.amount * (due - self.rolled), axis=0
+            )
+            self.rolled = due
+
+        return self.rolled < self.count
+
+
+class Cycle(Animation):
+    """Sets colors from pattern(pixel_count, elapsed_seconds) until cancelled or
+    duration seconds have passed"""
+
+    kind = "cycle"
+
+    def __init__(self, pixel_range, pattern, duration=None):
+        super().__init__(pixel_range)
+        self.pattern = pattern
+        self.duration = duration
+
+    def tick(self, rgb, now):
+        elapsed = now - self.start_time
+        strip_rgb = rgb[self.pixel_range]
+        strip_rgb[:, :] = self.pattern(len(strip_rgb), elapsed)
+
+        return (self.duration is None) or (elapsed < self.duration)
+
+
+class ImagePlayback(Animation):
+    """Shows the columns of an (H, W, 3) image one after the other, delay
+    seconds apart. Rows are scaled to the strip length."""
+
+    kind = "image"
+
+    def __init__(self, pixel_range, image_rgb, delay=0.05, loop=False):
+        super().__init__(pixel_range)
+        self.delay = delay
+        self.loop = loop
+
+        # (W, pixel_count, 3) with nearest rows
+        image_rgb = np.asarray(image_rgb, dtype=np.uint8)
+        pixel_count = pixel_range.stop - pixel_range.start
+        rows = (np.arange(pixel_count) * image_rgb.shape[0]) // pixel_count
+        self.columns = np.ascontiguousarray(image_rgb[rows].transpose((1, 0, 2)))
+
+    def tick(self, rgb, now):
+        column = int((now - self.start_time) / self.delay) if self.delay > 0 else 0
+        if self.loop:
+            column %= len(self.columns)
+        elif column >= len(self.columns):
+            return False
+
+        rgb[self.pixel_range] = self.columns[column]
+        return True
+
+    def describe(self):
+        description = super().describe()
+        description["columns"] = len(self.columns)
+        return description
+
+
+# -----------------------------------------------------------------------------
+
+
+class Animator:
+    """Timeline of active animations.
+
+    One greenlet ticks all animations in the order they were added (later ones
+    win where ranges overlap) and then calls show once per frame. Adding an
+    animation replaces the one with the same id and any whose range it covers.
+    """
+
+    def __init__(self, get_rgb, show, fps=60):
+        self.get_rgb = get_rgb
+        self.show = show
+        self.fps = fps
+
+        self.animations = collections.OrderedDict()
+        self._wakeup = gevent.event.Event()
+        self._greenlet = None
+
+    def start(self):
+        if self._greenlet is None:
+            self._greenlet = gevent.spawn(self._run)
+
+    def add(self, animation, id=None):
+        """Starts an animation and returns its id"""
+        if id is None:
+            id = uuid.uuid4().hex[:8]
+
+        self.animations.pop(id, None)
+
+        new_range = animation.pixel_range
+        for other_id, other in list(self.animations.items()):
+            other_range = other.pixel_range
+            if (new_range.start <= other_range.start) and (
+                other_range.stop <= new_range.stop
+            ):
+                del self.animations[other_id]
+
+        animation.start(self.get_rgb(), time.monotonic())
+        self.animations[id] = animation
+        self._wakeup.set()
+
+        return id
+
+    def cancel(self, id=None):
+        """Stops one animation (or all with id None) where it is. Returns the
+        number of animations stopped."""
+        if id is None:
+            count = len(self.animations)
+            self.animations.clear()
+            return count
+
+        return 1 if self.animations.pop(id, None) else 0
+
+    def describe(self):
+        return {id: animation.describe() for id, animation in self.animations.items()}
+
+    def _run(self):
+        period = 1 / self.fps if self.fps > 0 else 0
+        next_time = time.monotonic()
+        while True:
+            if not self.animations:
+                self._wakeup.clear()
+                self._wakeup.wait()
+                next_time = time.monotonic()
+
+            now = time.monotonic()
+            rgb = self.get_rgb()
+            for id, animation in list(self.animations.items()):
+                try:
+                    running = animation.tick(rgb, now)
+                except Exception as e:
+                    logging.exception("animation")
+                    running = False
+
+                if (not running) and (self.animations.get(id) is animation):
+                    del self.animations[id]
+
+            self.show()
+
+            # Fixed frame clock (skip frames when behind)
+            next_time += period
+            now = time.monotonic()
+            if next_time < now:
+                next_time = now
+
+            gevent.sleep(next_time - now)
@@ -0,0 +1,28 @@
+"""Timing helpers shared by the bench scripts"""
+
+import time
+
+
+def time_calls(func, min_seconds):
+    """Calls func repeatedly for at least min_seconds and returns (calls, seconds)"""
+    calls = 0
+    start_time = time.perf_counter()
+    elapsed = 0
+    while elapsed < min_seconds:
+        func()
+        calls += 1
+        elapsed = time.perf_counter() - start_time
+
+    return calls, elapsed
+
+
+def ms_per_call(func, min_seconds):
+    """Calls func repeatedly for at least min_seconds and returns ms/call"""
+    calls, elapsed = time_calls(func, min_seconds)
+    return (elapsed * 1000) / calls
+
+
+def frames_per_sec(func, min_seconds):
+    """Calls func repeatedly for at least min_seconds and returns calls/sec"""
+    calls, elapsed = time_calls(func, min_seconds)
+    return calls / elapsed
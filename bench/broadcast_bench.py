@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Measures server CPU per frame when fanning pixel frames out to simulated
+WebSocket clients, encoding once per frame vs. once per client."""
+import os
+import sys
+import time
+import argparse
+
+import gevent
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+import broadcast
+from broadcast import FrameBroadcaster
+
+# -----------------------------------------------------------------------------
+
+
+class FakeWebSocket:
+    """Counts frames sent to it, optionally taking a while to send each one"""
+
+    def __init__(self, send_delay=0):
+        self.closed = False
+        self.frames = 0
+        self.send_delay = send_delay
+
+    def send(self, message):
+        self.frames += 1
+        gevent.sleep(self.send_delay)
+
+
+def serve_per_client(broadcaster, ws, format):
+    """Previous approach: every client encodes every frame itself"""
+    version = None
+    while not ws.closed:
+        version = broadcaster.wait(version)
+        ws.send(
+            broadcaster.encoders[format](
+                broadcaster.version, broadcaster.timestamp, broadcaster.rgb
+            )
+        )
+
+
+def cpu_per_frame(serve, client_count, pixel_count, frame_count, format):
+    """Returns CPU milliseconds per frame and the slowest client's frame count"""
+    broadcaster = FrameBroadcaster()
+    rgb = np.random.RandomState(0).randint(0, 256, size=(pixel_count, 3))
+
+    # One client in ten is slow
+    sockets = [
+        FakeWebSocket(send_delay=0.01 if (i % 10) == 9 else 0)
+        for i in range(client_count)
+    ]
+    greenlets = [gevent.spawn(serve, broadcaster, ws, format) for ws in sockets]
+    gevent.sleep(0)
+
+    start_time = time.process_time()
+    for frame in range(frame_count):
+        rgb = np.roll(rgb, 1, axis=0)
+        broadcaster.publish(rgb)
+        gevent.sleep(0.001)
+
+    elapsed = time.process_time() - start_time
+
+    for ws in sockets:
+        ws.closed = True
+
+    gevent.killall(greenlets)
+
+    return (elapsed * 1000) / frame_count, min(ws.frames for ws in sockets)
+
+
+# -----------------------------------------------------------------------------
+
+
+def main():
+    parser = argparse.ArgumentParser("broadcast_bench.py")
+    parser.add_argument(
+        "--clients", nargs="+", type=int, default=[1, 10, 50, 100, 200]
+    )
+    parser.add_argument("--pixels", type=int, default=32, help="Strip length")
+    parser.add_argument("--frames", type=int, default=200, help="Frames to publish")
+    parser.add_argument(
+        "--format", default="json", choices=sorted(broadcast.ENCODERS.keys())
+    )
+    args = parser.parse_args()
+
+    print("clients\tper-client ms/frame\tencode-once ms/frame\tslowest client frames")
+    for client_count in args.clients:
+        per_client_ms, _ = cpu_per_frame(
+            serve_per_client, client_count, args.pixels, args.frames, args.format
+        )
+        once_ms, slowest_frames = cpu_per_frame(
+            FrameBroadcaster.serve, client_count, args.pixels, args.frames, args.format
+        )
+
+        print(
+            "%s\t%.3f\t%.3f\t%s/%s"
+            % (client_count, per_client_ms, once_ms, slowest_frames, args.frames)
+        )
+
+
+# -----------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    main()
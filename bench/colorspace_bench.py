@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Compares per-pixel colormath conversion against the vectorized colorspace
+module (and its lookup tables) in frames/sec for different strip lengths."""
+import os
+import sys
+import argparse
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logging.getLogger("colormath.color_conversions").setLevel(logging.WARN)
+
+import numpy as np
+from colormath.color_conversions import convert_color
+from colormath.color_objects import sRGBColor, XYZColor, HSLColor, CMYColor, IPTColor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+import colorspace
+from bench_util import frames_per_sec
+
+# Same mapping server.py used before vectorization
+colorspace_map = {
+    "rgb": sRGBColor,
+    "xyz": XYZColor,
+    "hsl": HSLColor,
+    "cmy": CMYColor,
+    "ipt": IPTColor,
+}
+
+# -----------------------------------------------------------------------------
+
+
+def colormath_show(rgb, source_color):
+    """Original per-pixel conversion from FakePixels.show()"""
+    rgb_show = np.zeros_like(rgb)
+    for i in range(rgb.shape[0]):
+        r, g, b, = rgb[i, :]
+        target_color = convert_color(source_color(r / 255, g / 255, b / 255), sRGBColor)
+        rgb_show[i, :] = [
+            max(min(int(v * 255), 255), 0) for v in target_color.get_value_tuple()
+        ]
+
+    return rgb_show
+
+
+# -----------------------------------------------------------------------------
+
+
+def main():
+    parser = argparse.ArgumentParser("colorspace_bench.py")
+    parser.add_argument(
+        "--pixels", nargs="+", type=int, default=[32, 1000, 10000], help="Strip lengths"
+    )
+    parser.add_argument(
+        "--colorspace", nargs="+", default=colorspace.COLORSPACES, help="Source spaces"
+    )
+    parser.add_argument(
+        "--lut-bits", type=int, default=8, help="Bits per channel of lookup tables"
+    )
+    parser.add_argument(
+        "--lut-interpolate",
+        action="store_true",
+        help="Interpolate trilinearly between lookup table points",
+    )
+    parser.add_argument(
+        "--seconds", type=float, default=1.0, help="Minimum time per measurement"
+    )
+    args = parser.parse_args()
+
+    rng = np.random.RandomState(0)
+    print(
+        "space\tpixels\tcolormath fps\tnumpy fps\tspeedup\tmax diff"
+        "\tlut fps\tlut max diff"
+    )
+
+    for pixel_count in args.pixels:
+        rgb = rng.randint(0, 256, size=(pixel_count, 3)).astype(np.uint8)
+        out = np.zeros_like(rgb)
+
+        for name in args.colorspace:
+            source_color = colorspace_map[name]
+            expected = colormath_show(rgb, source_color)
+            actual = colorspace.to_srgb(rgb, name)
+            max_diff = np.abs(expected.astype(int) - actual.astype(int)).max()
+
+            lut = colorspace.load_lut(
+                name, args.lut_bits, interpolate=args.lut_interpolate
+            )
+            actual_lut = colorspace.to_srgb(rgb, name, lut=lut)
+            lut_max_diff = np.abs(expected.astype(int) - actual_lut.astype(int)).max()
+
+            slow_fps = frames_per_sec(
+                lambda: colormath_show(rgb, source_color), args.seconds
+            )
+            fast_fps = frames_per_sec(
+                lambda: colorspace.to_srgb(rgb, name, out=out), args.seconds
+            )
+            lut_fps = frames_per_sec(
+                lambda: colorspace.to_srgb(rgb, name, out=out, lut=lut), args.seconds
+            )
+
+            print(
+                "%s\t%s\t%.1f\t%.1f\t%.0fx\t%s\t%.1f\t%s"
+                % (
+                    name,
+                    pixel_count,
+                    slow_fps,
+                    fast_fps,
+                    fast_fps / slow_fps,
+                    max_diff,
+                    lut_fps,
+                    lut_max_diff,
+                )
+            )
+
+
+# -----------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Compares full binary frames with delta frames in size and encode time for
+different amounts of change."""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+
+import delta
+from bench_util import ms_per_call
+
+# -----------------------------------------------------------------------------
+
+
+def main():
+    parser = argparse.ArgumentParser("delta_bench.py")
+    parser.add_argument(
+        "--pixels",
+        nargs="+",
+        type=int,
+        default=[300, 5000, 20000],
+        help="Strip lengths",
+    )
+    parser.add_argument(
+        "--seconds", type=float, default=0.2, help="Minimum time per measurement"
+    )
+    args = parser.parse_args()
+
+    rng = np.random.RandomState(0)
+    changes = [("1 pixel", 1), ("1 range", None), ("1%", 0.01), ("10%", 0.1)]
+
+    print("pixels\tchange\tfull bytes\tdelta bytes\tfull ms\tdelta ms")
+    for pixel_count in args.pixels:
+        base_rgb = rng.randint(0, 256, size=(pixel_count, 3)).astype(np.uint8)
+        for name, amount in changes:
+            rgb = base_rgb.copy()
+            if amount is None:
+                rgb[: pixel_count // 10] = 0
+            elif amount == 1:
+                rgb[pixel_count // 2, 0] += 1
+            else:
+                indexes = rng.choice(pixel_count, int(pixel_count * amount), False)
+                rgb[indexes, 1] += 1
+
+            full = rgb.tobytes()
+            frame = delta.encode_delta(2, 1, base_rgb, rgb)
+
+            check_rgb = base_rgb.copy()
+            delta.apply_frame(check_rgb, frame)
+            assert np.array_equal(check_rgb, rgb)
+
+            print(
+                "%s\t%s\t%s\t%s\t%.3f\t%.3f"
+                % (
+                    pixel_count,
+                    name,
+                    len(full),
+                    len(frame),
+                    ms_per_call(rgb.tobytes, args.seconds),
+                    ms_per_call(
+                        lambda: delta.encode_delta(2, 1, base_rgb, rgb), args.seconds
+                    ),
+                )
+            )
+
+
+# -----------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Compares game_gui's frame clock with sleeping ANIMATION_DELAY after each
+frame, using simulated per-frame work. Reports the real period, jitter, and
+the timing of a recording made with frame timestamps."""
+import os
+import sys
+import time
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# game_gui parses its arguments on import
+bench_argv = sys.argv[1:]
+sys.argv = sys.argv[:1] + ["--no-pi"]
+import numpy as np
+import game_gui
+import sequence
+
+# -----------------------------------------------------------------------------
+
+
+def run_sleep(frames, period, work_seconds):
+    """Previous loop: work, then sleep for the delay"""
+    times = []
+    for _ in range(frames):
+        times.append(time.monotonic())
+        time.sleep(work_seconds)
+        time.sleep(period)
+
+    return np.array(times), 0, None
+
+
+def run_clock(frames, period, work_seconds):
+    clock = game_gui.FrameClock(report_seconds=float("inf"))
+    times = []
+    steps = 0
+    for _ in range(frames):
+        times.append(time.monotonic())
+        time.sleep(work_seconds)
+        steps += clock.wait(period)
+
+    return np.array(times), steps - frames, np.array(clock.jitter)
+
+
+def main():
+    parser = argparse.ArgumentParser("frame_clock_bench.py")
+    parser.add_argument("--frames", type=int, default=100, help="Frames per run")
+    parser.add_argument(
+        "--period", type=float, default=0.02, help="Target seconds per frame"
+    )
+    parser.add_argument(
+        "--work",
+        nargs="+",
+        type=float,
+        default=[0.0, 0.005, 0.015, 0.03],
+        help="Simulated seconds of work per frame",
+    )
+    args = parser.parse_args(bench_argv)
+
+    print("loop\twork ms\tperiod ms\tdrift ms\tjitter ms (mean/max)\tcaught up")
+    for work_seconds in args.work:
+        for name, run in [("sleep", run_sleep), ("clock", run_clock)]:
+            times, caught_up, jitter = run(args.frames, args.period, work_seconds)
+            periods = np.diff(times)
+            drift = (times[-1] - times[0]) - (len(periods) * args.period)
+            jitter_text = "-"
+            if jitter is not None:
+                jitter_text = "%.2f/%.2f" % (jitter.mean() * 1000, jitter.max() * 1000)
+
+            print(
+                "%s\t%.1f\t%.2f\t%.1f\t%s\t%s"
+                % (
+                    name,
+                    work_seconds * 1000,
+                    periods.mean() * 1000,
+                    drift * 1000,
+                    jitter_text,
+                    caught_up,
+                )
+            )
+
+    # Recording with a delay that changes halfway through
+    fd, seq_path = tempfile.mkstemp(suffix=".seq")
+    os.close(fd)
+    try:
+        recorder = sequence.SequenceRecorder(
+            seq_path, 4, game_gui.RECORD_SECONDS, start_time=0
+        )
+        timestamps = np.concatenate(
+            [np.arange(0, 1, 0.05), 1 + np.arange(0, 0.5, 0.01)]
+        )
+        for i, timestamp in enumerate(timestamps):
+            recorder.add(np.full((4, 3), i % 256, dtype=np.uint8), timestamp)
+
+        recorder.close()
+
+        recorded = sequence.open_sequence(seq_path)
+        replayed = [int(recorded.frame_at(t + 0.001)[0, 0]) for t in timestamps]
+        print(
+            "recording: %s frame(s), %.2f second(s), replays in order: %s"
+            % (
+                len(recorded),
+                recorded.duration,
+                replayed == list(range(len(timestamps))),
+            )
+        )
+    finally:
+        os.remove(seq_path)
+
+
+# -----------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Measures game_gui apply_ops frames/sec with every controller driving every
+operation, comparing the running stage totals against re-adding each
+operation/controller array per frame."""
+import os
+import sys
+import argparse
+import itertools
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# game_gui parses its arguments on import
+bench_argv = sys.argv[1:]
+sys.argv = sys.argv[:1] + ["--no-pi"]
+import numpy as np
+import game_gui
+from bench_util import frames_per_sec
+
+# -----------------------------------------------------------------------------
+
+
+def readd_sums(stage):
+    """Previous approach: walk every operation/controller array each frame"""
+    total = np.zeros(shape=(game_gui.PIXEL_COUNT, 3), dtype=int)
+    for op in game_gui.stages[stage]:
+        if op in game_gui.state.sums:
+            for ctrl_array in game_gui.state.sums[op].values():
+                total += ctrl_array
+
+    return total
+
+
+# -----------------------------------------------------------------------------
+
+
+def main():
+    parser = argparse.ArgumentParser("game_ops_bench.py")
+    parser.add_argument(
+        "--seconds", type=float, default=1.0, help="Minimum time per measurement"
+    )
+    args = parser.parse_args(bench_argv)
+
+    ctrl_names = list(
+        itertools.chain(
+            game_gui.BUTTONS.values(),
+            game_gui.AXES.values(),
+            game_gui.TRIGGERS.values(),
+            game_gui.HATS.values(),
+        )
+    )
+
+    # Activate every color operation on every controller
+    for ctrl_name in ctrl_names:
+        for op in game_gui.DISCRETE_OPS:
+            if op in game_gui.op_stages:
+                game_gui.state.do_discrete_op(ctrl_name, op, on=True)
+
+        for op in game_gui.CONT_OPS:
+            if op in game_gui.op_stages:
+                game_gui.state.do_cont_op(ctrl_name, op, 0.1)
+
+    active = sum(len(ctrl_arrays) for ctrl_arrays in game_gui.state.sums.values())
+    print("%s active operation/controller arrays" % active)
+
+    for stage, stage_sum in game_gui.state.stage_sums.items():
+        assert np.array_equal(stage_sum, readd_sums(stage)), stage
+
+    pixels = np.random.RandomState(0).randint(0, 256, size=(game_gui.PIXEL_COUNT, 3))
+    pixels = pixels.astype(np.uint8)
+
+    stage_sums = game_gui.state.stage_sums
+    readd_fps = frames_per_sec(
+        lambda: [readd_sums(stage) for stage in game_gui.stages], args.seconds
+    )
+    total_fps = frames_per_sec(
+        lambda: [np.array(stage_sum) for stage_sum in stage_sums.values()],
+        args.seconds,
+    )
+    apply_fps = frames_per_sec(
+        lambda: game_gui.apply_ops(pixels, stage_sums), args.seconds
+    )
+
+    print("re-add sums:\t%.1f fps" % readd_fps)
+    print("stage totals:\t%.1f fps" % total_fps)
+    print("apply_ops:\t%.1f fps" % apply_fps)
+
+
+# -----------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""Replays gamepad input at realistic rates through game_gui, comparing
+handle_events (axes applied once per animation frame, changed highlights
+only) with handling, publishing, and forwarding every event as it wakes up
+the Pygame thread."""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# game_gui parses its arguments on import
+bench_argv = sys.argv[1:]
+sys.argv = sys.argv[:1] + ["--no-pi"]
+import numpy as np
+import pygame
+import game_gui
+
+# -----------------------------------------------------------------------------
+
+
+def make_wakeups(event_count, wakeup_events, seed=0):
+    """Stick/trigger motion split into pygame.event.wait() wakeups of
+    wakeup_events events, with a button press or release every 50 events"""
+    rng = np.random.RandomState(seed)
+    axes = list(game_gui.AXES) + list(game_gui.TRIGGERS)
+    events = []
+    for i in range(event_count):
+        if (i % 50) == 0:
+            button_type = pygame.JOYBUTTONDOWN if (i % 100) == 0 else pygame.JOYBUTTONUP
+            events.append(pygame.event.Event(button_type, button=0))
+        else:
+            events.append(
+                pygame.event.Event(
+                    pygame.JOYAXISMOTION,
+                    axis=int(rng.choice(axes)),
+                    value=float(rng.uniform(-1, 1)),
+                )
+            )
+
+    return [
+        events[i : i + wakeup_events] for i in range(0, len(events), wakeup_events)
+    ]
+
+
+def handle_each(events, forwarded):
+    """Previous approach: every event is handled and forwarded to TK"""
+    for event in events:
+        forwarded.append(event)
+        if event.type in [pygame.JOYBUTTONDOWN, pygame.JOYBUTTONUP]:
+            button_name = game_gui.BUTTONS.get(event.button, "")
+            op = game_gui.BUTTON_OPS.get(button_name, None)
+            if op:
+                on = event.type == pygame.JOYBUTTONDOWN
+                game_gui.state.do_discrete_op(button_name, op, on=on)
+        elif event.type == pygame.JOYAXISMOTION:
+            if event.axis in game_gui.TRIGGERS:
+                axis_name = game_gui.TRIGGERS.get(event.axis, "")
+                value = (event.value + 1) / 2
+            else:
+                axis_name = game_gui.AXES.get(event.axis, "")
+                value = event.value
+
+            op = game_gui.AXIS_OPS.get(axis_name, None)
+            if op:
+                game_gui.state.do_cont_op(axis_name, op, value)
+
+
+def main():
+    parser = argparse.ArgumentParser("gamepad_bench.py")
+    parser.add_argument("--events", type=int, default=6000, help="Events replayed")
+    parser.add_argument(
+        "--event-rates",
+        nargs="+",
+        type=int,
+        default=[250, 1000],
+        help="Events/sec from the gamepad",
+    )
+    parser.add_argument(
+        "--wakeup-events",
+        nargs="+",
+        type=int,
+        default=[1, 2],
+        help="Events per Pygame wakeup",
+    )
+    parser.add_argument("--fps", type=float, default=60, help="Animation frames/sec")
+    args = parser.parse_args(bench_argv)
+
+    # Count operations done and snapshots published
+    state = game_gui.state
+    do_cont_op = state.do_cont_op
+    publish = state.publish
+    counts = {"ops": 0, "publishes": 0}
+
+    def counted_cont_op(*op_args):
+        counts["ops"] += 1
+        do_cont_op(*op_args)
+
+    def counted_publish():
+        counts["publishes"] += 1
+        publish()
+
+    state.do_cont_op = counted_cont_op
+    state.publish = counted_publish
+
+    print(
+        "events/sec\tevents/wakeup\tapproach\tms CPU/sec\tcontinuous ops"
+        "\tpublishes\tTK updates"
+    )
+    for event_rate in args.event_rates:
+        input_seconds = args.events / event_rate
+        frame_count = int(input_seconds * args.fps)
+        for wakeup_events in args.wakeup_events:
+            wakeups = make_wakeups(args.events, wakeup_events)
+
+            # Wakeups that arrive before each frame
+            frame_ends = set(
+                (np.arange(1, frame_count + 1) * len(wakeups)) // frame_count
+            )
+
+            results = []
+
+            counts.update(ops=0, publishes=0)
+            forwarded = []
+            start_time = time.perf_counter()
+            for wakeup in wakeups:
+                handle_each(wakeup, forwarded)
+                state.publish()
+
+            elapsed = time.perf_counter() - start_time
+            results.append(("each", elapsed, dict(counts), len(forwarded)))
+
+            counts.update(ops=0, publishes=0)
+            updates = 0
+            axis_values, highlights = {}, {}
+            start_time = time.perf_counter()
+            for i, wakeup in enumerate(wakeups):
+                updates += len(game_gui.handle_events(wakeup, axis_values, highlights))
+                if (i + 1) in frame_ends:
+                    state.apply_axes()
+
+            elapsed = time.perf_counter() - start_time
+            results.append(("per frame", elapsed, dict(counts), updates))
+
+            for approach, elapsed, op_counts, updates in results:
+                print(
+                    "%s\t%s\t%s\t%.2f\t%s\t%s\t%s"
+                    % (
+                        event_rate,
+                        wakeup_events,
+                        approach,
+                        elapsed * 1000 / input_seconds,
+                        op_counts["ops"],
+                        op_counts["publishes"],
+                        updates,
+                    )
+                )
+
+
+# -----------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""Times each pattern when rendered from scratch and when served from the
+frame cache."""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import patterns
+
+# -----------------------------------------------------------------------------
+
+
+def main():
+    parser = argparse.ArgumentParser("patterns_bench.py")
+    parser.add_argument(
+        "--pixels",
+        nargs="+",
+        type=int,
+        default=[32, 1000, 20000],
+        help="Strip lengths",
+    )
+    args = parser.parse_args()
+
+    phases = [step / patterns.PHASE_STEPS for step in range(patterns.PHASE_STEPS)]
+
+    print("pattern\tpixels\tcold\tcached\t(ms per frame)")
+    for pixel_count in args.pixels:
+        for name in patterns.PATTERNS:
+            times = []
+            for _ in range(2):
+                start_time = time.perf_counter()
+                for phase in phases:
+                    patterns.render(name, pixel_count, phase)
+
+                times.append((time.perf_counter() - start_time) * 1000 / len(phases))
+
+            print("%s\t%s\t%.3f\t%.4f" % (name, pixel_count, times[0], times[1]))
+
+    print(patterns.cache_info())
+
+
+# -----------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Sweeps the server's API and render paths across strip lengths and reports
+milliseconds per call."""
+import os
+import sys
+import json
+import logging
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# server parses its arguments on import
+bench_argv = sys.argv[1:]
+sys.argv = sys.argv[:1] + ["--no-pi", "--max-fps", "0"]
+import numpy as np
+import server
+import broadcast
+from bench_util import ms_per_call
+
+logging.getLogger().setLevel(logging.WARN)
+
+# -----------------------------------------------------------------------------
+
+
+def main():
+    parser = argparse.ArgumentParser("pixels_bench.py")
+    parser.add_argument(
+        "--pixels",
+        nargs="+",
+        type=int,
+        default=[32, 300, 1000, 5000, 20000],
+        help="Strip lengths",
+    )
+    parser.add_argument(
+        "--seconds", type=float, default=0.5, help="Minimum time per measurement"
+    )
+    args = parser.parse_args(bench_argv)
+
+    client = server.app.test_client()
+    octet_stream = "application/octet-stream"
+    rng = np.random.RandomState(0)
+
+    tests = [
+        (
+            "POST raw bytes",
+            lambda n, rgb: client.post(
+                "/pixels/raw", data=rgb.tobytes(), content_type=octet_stream
+            ),
+        ),
+        (
+            "POST rgb json",
+            lambda n, rgb: client.post("/pixels/rgb", data=json.dumps(rgb.tolist())),
+        ),
+        ("POST r scalar", lambda n, rgb: client.post("/pixels/r", data="255")),
+        ("GET pixels", lambda n, rgb: client.get("/pixels")),
+        ("POST rainbow", lambda n, rgb: client.post("/pattern/rainbow")),
+        ("render ipt", lambda n, rgb: server.render_pixels()),
+        (
+            "encode json",
+            lambda n, rgb: broadcast.encode_json(0, 0, server.pixels.rgb_show),
+        ),
+        (
+            "encode bin",
+            lambda n, rgb: broadcast.encode_bin(0, 0, server.pixels.rgb_show),
+        ),
+    ]
+
+    print("pixels\t" + "\t".join(name for name, _ in tests) + "\t(ms per call)")
+    for pixel_count in args.pixels:
+        server.pixels = server.FakePixels(pixel_count)
+        server.pixels.conversion = ("ipt", None)
+        rgb = rng.randint(0, 256, size=(pixel_count, 3)).astype(np.uint8)
+
+        times = [
+            ms_per_call(lambda: func(pixel_count, rgb), args.seconds)
+            for _, func in tests
+        ]
+
+        print("%s\t" % pixel_count + "\t".join("%.3f" % t for t in times))
+
+
+# -----------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Checks that writes made within one frame of the render scheduler are all
+kept and read back (server.py with the default --max-fps)."""
+import os
+import sys
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# server parses its arguments on import
+sys.argv = sys.argv[:1] + ["--no-pi", "--max-fps", "60"]
+import gevent
+import server
+
+logging.getLogger().setLevel(logging.WARN)
+
+# -----------------------------------------------------------------------------
+
+
+def check(name, requests, url, expected):
+    """Runs requests (method, url, data) back to back, then GETs url"""
+    client = server.app.test_client()
+    server.pixels.clear()
+    server.show_pixels()
+    server.flush_pixels()
+
+    for method, request_url, data in requests:
+        response = client.open(request_url, method=method, data=data)
+        assert response.status_code == 200, (request_url, response.status_code)
+
+    actual = client.get(url).get_json()
+
+    # Also after the scheduled frame
+    gevent.sleep(0.1)
+    shown = client.get(url).get_json()
+
+    ok = (actual == expected) and (shown == expected)
+    print("%s\t%s" % ("ok" if ok else "FAILED", name))
+    if not ok:
+        print("  expected %s, got %s (%s after frame)" % (expected, actual, shown))
+
+    return ok
+
+
+def main():
+    results = [
+        check(
+            "two channel writes to one pixel",
+            [("POST", "/pixel/0/r", "255"), ("POST", "/pixel/0/g", "255")],
+            "/pixel/0",
+            {"i": 0, "r": 255, "g": 255, "b": 0},
+        ),
+        check(
+            "pixel write then read",
+            [("POST", "/pixel/1", "[1, 2, 3]")],
+            "/pixel/1",
+            {"i": 1, "r": 1, "g": 2, "b": 3},
+        ),
+        check(
+            "two channel writes to all pixels",
+            [("POST", "/pixels/r", "255"), ("POST", "/pixels/b", "255")],
+            "/pixels/rb",
+            [[255, 255]] * server.pixels.pixel_count,
+        ),
+        check(
+            "channel list after pixel write",
+            [("POST", "/pixel/0", "[1, 2, 3]"), ("POST", "/pixels/g", "[9]")],
+            "/pixel/0",
+            {"i": 0, "r": 1, "g": 9, "b": 3},
+        ),
+    ]
+
+    if not all(results):
+        sys.exit(1)
+
+
+# -----------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Measures how late the gevent hub wakes up other greenlets while frames are
+rendered continuously, with and without the render thread."""
+import os
+import sys
+import time
+import logging
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# server parses its arguments on import
+bench_argv = sys.argv[1:]
+sys.argv = sys.argv[:1] + ["--no-pi", "--max-fps", "0"]
+import gevent
+import numpy as np
+import server
+
+logging.getLogger().setLevel(logging.WARN)
+
+# -----------------------------------------------------------------------------
+
+
+def hub_lateness(seconds, interval=0.001):
+    """Renders frames back to back for some seconds while another greenlet
+    sleeps for interval. Returns how late each wakeup was (ms)."""
+    lateness = []
+    running = True
+
+    def render_loop():
+        while running:
+            server.render_pixels()
+            gevent.sleep(0)
+
+    def probe_loop():
+        while running:
+            start_time = time.perf_counter()
+            gevent.sleep(interval)
+            lateness.append((time.perf_counter() - start_time - interval) * 1000)
+
+    greenlets = [gevent.spawn(render_loop), gevent.spawn(probe_loop)]
+    gevent.sleep(seconds)
+    running = False
+    gevent.joinall(greenlets)
+
+    return np.array(lateness)
+
+
+# -----------------------------------------------------------------------------
+
+
+def main():
+    parser = argparse.ArgumentParser("render_bench.py")
+    parser.add_argument(
+        "--pixels",
+        nargs="+",
+        type=int,
+        default=[32, 1000, 5000, 20000],
+        help="Strip lengths",
+    )
+    parser.add_argument("--colorspace", default="ipt", help="Source colorspace")
+    parser.add_argument(
+        "--seconds", type=float, default=1.0, help="Time per measurement"
+    )
+    args = parser.parse_args(bench_argv)
+
+    print("pixels\tthread\tp50\tp99\tmax\t(ms late)")
+    for pixel_count in args.pixels:
+        server.pixels = server.FakePixels(pixel_count)
+        server.pixels.conversion = (args.colorspace, None)
+        server.pixels.rgb[:, :] = np.random.RandomState(0).randint(
+            0, 256, size=(pixel_count, 3)
+        )
+
+        for render_thread in [False, True]:
+            server.args.render_thread = render_thread
+            lateness = hub_lateness(args.seconds)
+            print(
+                "%s\t%s\t%.3f\t%.3f\t%.3f"
+                % (
+                    pixel_count,
+                    render_thread,
+                    np.percentile(lateness, 50),
+                    np.percentile(lateness, 99),
+                    lateness.max(),
+                )
+            )
+
+
+# -----------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Compares per-pixel Adafruit_WS2801 output with whole-frame SPI writes and
+checks that both put the same bytes on the wire."""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+
+from spi_pixels import SpiPixelWriter, open_spi
+from bench_util import ms_per_call
+
+# -----------------------------------------------------------------------------
+
+
+class RecordingSpi:
+    """Adafruit_GPIO.SPI interface that records writes"""
+
+    def __init__(self):
+        self.transfers = []
+
+    def set_clock_hz(self, hz):
+        pass
+
+    def set_mode(self, mode):
+        pass
+
+    def set_bit_order(self, order):
+        pass
+
+    def write(self, data):
+        self.transfers.append(bytes(data))
+
+
+# -----------------------------------------------------------------------------
+
+
+def main():
+    parser = argparse.ArgumentParser("spi_bench.py")
+    parser.add_argument(
+        "--pixels",
+        nargs="+",
+        type=int,
+        default=[32, 300, 1000, 5000],
+        help="Strip lengths",
+    )
+    parser.add_argument(
+        "--seconds", type=float, default=0.5, help="Minimum time per measurement"
+    )
+    args = parser.parse_args()
+
+    try:
+        import Adafruit_WS2801 as WS2801
+    except ImportError:
+        WS2801 = None
+        print("Adafruit_WS2801 not installed, skipping per-pixel path")
+
+    # Don't measure the 2ms latch sleep of WS2801Pixels.show
+    time_sleep = time.sleep
+    time.sleep = lambda seconds: None
+
+    rng = np.random.RandomState(0)
+
+    print("pixels\tper-pixel\tframe\tframe+gamma\t(ms per frame)")
+    for pixel_count in args.pixels:
+        rgb = rng.randint(0, 256, size=(pixel_count, 3)).astype(np.uint8)
+
+        writer = SpiPixelWriter(pixel_count, open_spi(fake=True))
+        gamma_writer = SpiPixelWriter(pixel_count, open_spi(fake=True), gamma=2.2)
+        times = []
+
+        if WS2801 is not None:
+            spi = RecordingSpi()
+            real_pixels = WS2801.WS2801Pixels(pixel_count, spi=spi)
+
+            def per_pixel():
+                for i, (r, g, b) in enumerate(rgb.tolist()):
+                    real_pixels.set_pixel_rgb(i, b, g, r)
+
+                real_pixels.show()
+
+            times.append(ms_per_call(per_pixel, args.seconds))
+        else:
+            times.append(float("nan"))
+
+        times.append(ms_per_call(lambda: writer.write(rgb), args.seconds))
+        times.append(ms_per_call(lambda: gamma_writer.write(rgb), args.seconds))
+
+        if WS2801 is not None:
+            assert spi.transfers[-1] == writer.spi.transfers[-1], "Bytes differ"
+
+        print("%s\t" % pixel_count + "\t".join("%.3f" % t for t in times))
+
+    time.sleep = time_sleep
+
+
+# -----------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    main()
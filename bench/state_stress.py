@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Stress test for game_gui's shared state: replays synthetic gamepad event
+storms (sticks, rolls, Copy, and Record) through handle_events while another
+thread renders frames as fast as it can, and counts torn frames.
+
+Every batch moves the red and blue sticks to the same value, so any frame
+where red and blue differ (or green isn't 0) mixed two batches. --live
+renders from the arrays being changed instead of published controls, with
+the sticks applied by the input thread.
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# game_gui parses its arguments on import
+bench_argv = sys.argv[1:]
+sys.argv = sys.argv[:1] + ["--no-pi"]
+import numpy as np
+import pygame
+import game_gui
+import sequence
+
+# -----------------------------------------------------------------------------
+
+
+def make_batch(rng, index):
+    value = float(rng.uniform(-1, 1))
+    batch = [
+        pygame.event.Event(pygame.JOYAXISMOTION, axis=axis, value=value)
+        for axis, axis_name in game_gui.AXES.items()
+        if game_gui.AXIS_OPS.get(axis_name) in ["Red", "Blue"]
+    ]
+
+    # Rolls
+    batch.append(
+        pygame.event.Event(
+            pygame.JOYAXISMOTION, axis=5, value=float(rng.uniform(-1, 1))
+        )
+    )
+
+    # Copy and Record (button down and up)
+    for button, every in [(5, 7), (8, 2500)]:
+        if (index % every) == 0:
+            batch.append(pygame.event.Event(pygame.JOYBUTTONDOWN, button=button))
+            batch.append(pygame.event.Event(pygame.JOYBUTTONUP, button=button))
+
+    return batch
+
+
+def render_run(state, live, stop, results):
+    renderer = game_gui.Renderer(state)
+    frames, torn = 0, 0
+    while not stop.is_set():
+        if live:
+            controls = state.controls._replace(stage_sums=state.stage_sums)
+        else:
+            state.apply_axes()
+            controls = state.controls
+
+        now = time.monotonic()
+        rgb = renderer.render(controls, now)
+        if controls.recorder is not None:
+            controls.recorder.add(rgb, now)
+
+        frames += 1
+        if (rgb[:, 1] != 0).any() or (rgb[:, 0] != rgb[:, 2]).any():
+            torn += 1
+
+    results.extend([frames, torn])
+
+
+def main():
+    parser = argparse.ArgumentParser("state_stress.py")
+    parser.add_argument("--batches", type=int, default=20000, help="Event batches")
+    parser.add_argument(
+        "--live",
+        action="store_true",
+        help="Render from the arrays being changed (no snapshots)",
+    )
+    args = parser.parse_args(bench_argv)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    # Sticks on red and blue, right trigger rolls, rb copies, logitech records
+    game_gui.AXIS_OPS.update({"rx": "Red", "ry": "Blue", "rt": "RollR"})
+    for axis_name in ["lx", "ly", "lt"]:
+        game_gui.AXIS_OPS.pop(axis_name, None)
+
+    state = game_gui.state
+    rng = np.random.RandomState(0)
+    batches = [make_batch(rng, i) for i in range(args.batches)]
+
+    stop = threading.Event()
+    results = []
+    render_thread = threading.Thread(
+        target=render_run, args=(state, args.live, stop, results)
+    )
+    render_thread.start()
+
+    axis_values, highlights = {}, {}
+    start_time = time.perf_counter()
+    for batch in batches:
+        game_gui.handle_events(batch, axis_values, highlights)
+        if args.live:
+            # Sticks change the arrays while they are rendered
+            state.apply_axes()
+
+    elapsed = time.perf_counter() - start_time
+    stop.set()
+    render_thread.join()
+
+    with state.lock:
+        state.stop_recording()
+        state.publish()
+        if state.recorder is not None:
+            recorded = sequence.open_sequence(state.recorder.path)
+            print(
+                "last recording: %s frame(s) added, %s written, %s readable"
+                % (
+                    state.recorder.frames_added,
+                    state.recorder.frames_written,
+                    len(recorded),
+                )
+            )
+            os.remove(state.recorder.path)
+
+    frames, torn = results
+    print(
+        "%s batch(es) in %.2f second(s) (%.1f us/batch), %s copies"
+        % (len(batches), elapsed, elapsed * 1e6 / len(batches), state.copies)
+    )
+    print("%s frame(s) rendered, %s torn" % (frames, torn))
+
+    if torn > 0:
+        sys.exit(1)
+
+
+# -----------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    main()
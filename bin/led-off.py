@@ -1,4 +1,5 @@
 #!/usr/bin/env python3
+import os
 
 # Simple demo of of the WS2801/SPI-like addressable RGB LED lights.
 import RPi.GPIO as GPIO
@@ -7,8 +8,8 @@ import RPi.GPIO as GPIO
 import Adafruit_WS2801
 import Adafruit_GPIO.SPI as SPI
 
-# Configure the count of pixels:
-PIXEL_COUNT = 32
+# Configure the count of pixels (LED_PIXEL_COUNT overrides):
+PIXEL_COUNT = int(os.environ.get("LED_PIXEL_COUNT", 32))
 
 # Alternatively specify a hardware SPI connection on /dev/spidev0.0:
 SPI_PORT = 0
@@ -1,13 +1,48 @@
+import os
 import sys
 import time
-from collections import defaultdict
+import json
+import socket
+import functools
 
-# Simple demo of of the WS2801/SPI-like addressable RGB LED lights.
-import RPi.GPIO as GPIO
+# Unix socket of a resident led-on (started with --daemon)
+SOCKET_PATH = os.environ.get("LED_SOCKET", "/tmp/led-on.sock")
 
-# Import the WS2801 module.
-import Adafruit_WS2801
-import Adafruit_GPIO.SPI as SPI
+
+def send_commands(commands, socket_path=SOCKET_PATH):
+    """Runs commands in the daemon. Returns its reply or None if not running."""
+    try:
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(socket_path)
+    except OSError:
+        return None
+
+    with client:
+        # Relative sample paths are resolved from here
+        request = {"cwd": os.getcwd(), "commands": commands}
+        client.sendall(json.dumps(request).encode() + b"\n")
+        client.shutdown(socket.SHUT_WR)
+
+        reply = b""
+        while True:
+            data = client.recv(4096)
+            if not data:
+                break
+
+            reply += data
+
+    return json.loads(reply.decode())
+
+
+# Thin client: skip the imports and SPI setup below when a daemon is running
+if (__name__ == "__main__") and ("--daemon" not in sys.argv[1:]):
+    reply = send_commands(sys.argv[1:] or ["white"])
+    if reply is not None:
+        if "error" in reply:
+            print(reply["error"], file=sys.stderr)
+            sys.exit(1)
+
+        sys.exit(0)
 
 # Library to get RGB values from color name
 import webcolors
@@ -15,118 +50,240 @@ import webcolors
 # Matrix math
 import numpy as np
 
-# Image library
-from PIL import Image
+# Modules shared with the server (one directory up)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# Whole-frame output to the WS2801 strip
+from spi_pixels import SpiPixelWriter, open_spi
+
+# PNG samples (one column per frame)
+import sequence
+
+# Rainbow, chase, fire, etc.
+import patterns
 
-# Configure the count of pixels:
-PIXEL_COUNT = 32
+# Configure the count of pixels (LED_PIXEL_COUNT overrides):
+PIXEL_COUNT = int(os.environ.get("LED_PIXEL_COUNT", 32))
 
-# Alternatively specify a hardware SPI connection on /dev/spidev0.0:
+# Hardware SPI connection on /dev/spidev0.0 (LED_FAKE_SPI=1 to only record):
 SPI_PORT = 0
 SPI_DEVICE = 0
-pixels = Adafruit_WS2801.WS2801Pixels(
-    PIXEL_COUNT, spi=SPI.SpiDev(SPI_PORT, SPI_DEVICE), gpio=GPIO
+pixels = SpiPixelWriter(
+    PIXEL_COUNT,
+    open_spi(SPI_PORT, SPI_DEVICE, fake=bool(os.environ.get("LED_FAKE_SPI"))),
 )
 
+# Seconds between columns of a sample
+SAMPLE_DELAY = 0.05
+
 # ----------------------------------------------------------------------------
 
-def make_wheel():
-    wheel = np.zeros(shape=(256, 3), dtype=np.uint8)
-
-    for i in range(256):
-        pos = i
-        if pos < 85:
-            pos = (pos * 3) % 256
-            wheel[i, :] = [0, 255 - pos, pos]
-        elif pos < 170:
-            pos = ((pos - 85) * 3) % 256
-            wheel[i, :] = [pos, 0, 255 - pos]
-        else:
-            pos = ((pos - 170) * 3) % 256
-            wheel[i, :] = [255 - pos, 0, pos]
+# Pattern name -> function returning (PIXEL_COUNT, 3) colors
+PATTERNS = {
+    name: functools.partial(patterns.render, name, PIXEL_COUNT)
+    for name in patterns.PATTERNS
+}
 
-    return wheel
+# Macro name -> compiled program
+COMMANDS = {}
 
-wheel = make_wheel()
+# ----------------------------------------------------------------------------
 
-def rainbow():
-    return wheel[np.linspace(0, 255, PIXEL_COUNT, dtype=int),:]
+# Real path -> (modification time, (columns, PIXEL_COUNT, 3) colors)
+sample_cache = {}
 
-# ----------------------------------------------------------------------------
 
-PATTERNS = {
-    "rainbow": rainbow
-}
+def load_sample(path):
+    """Decodes an image once (until it changes) and fits it to the strip"""
+    # Daemon clients run from their own directories
+    path = os.path.realpath(path)
+    mtime = os.path.getmtime(path)
+    cached = sample_cache.get(path)
+    if (cached is not None) and (cached[0] == mtime):
+        return cached[1]
 
-COMMANDS = defaultdict(list)
+    columns = sequence.read_png_frames(path)
+    height = columns.shape[1]
+    if height != PIXEL_COUNT:
+        # Nearest rows
+        rows = (np.arange(PIXEL_COUNT) * height) // PIXEL_COUNT
+        columns = np.ascontiguousarray(columns[:, rows])
 
-# ----------------------------------------------------------------------------
+    sample_cache[path] = (mtime, columns)
+    return columns
+
+
+class Clock:
+    """Deadlines measured from a start time, so slow frames don't add up"""
+
+    def __init__(self):
+        self.time = time.monotonic()
 
-current_command = None
-sample = False
+    def wait(self, seconds):
+        self.time += seconds
+        delay = self.time - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
 
-def handle_command(command):
-    global current_command, sample
-    if command.endswith(".") and (command[:-1] == current_command):
-        current_command = None
-        return
 
-    if current_command is not None:
-        COMMANDS[current_command].append(command)
-        return
+def play_sample(path, clock):
+    """Shows each column of an image for SAMPLE_DELAY seconds"""
+    for column in load_sample(path):
+        pixels.write(column)
+        clock.wait(SAMPLE_DELAY)
 
+
+# ----------------------------------------------------------------------------
+
+# Instructions of a compiled program:
+# (SHOW, rgb) - send (PIXEL_COUNT, 3) colors to the strip
+# (SLEEP, seconds)
+# (SAMPLE, path) - play image columns
+# (REPEAT, count, program)
+# (CALL, name) - run macro (looked up when run, so it may be defined later)
+# (DEFINE, name, program) - set macro
+SHOW, SLEEP, SAMPLE, REPEAT, CALL, DEFINE = range(6)
+
+
+def compile_command(command, macros):
+    """Compiles a single command (not a definition or sample)"""
     try:
-        seconds = float(command)
-        time.sleep(seconds)
-        return
+        return (SLEEP, float(command))
     except ValueError:
         pass  # not a decimal
 
-    # Image sample
-    if sample:
-        sample = False
-        sample_path = command
-        sample_img = Image.open(sample_path)
-        for x in range(sample_img.width):
-            for y in range(sample_img.height):
-                r, g, b = sample_img.getpixel((x, y))
-                pixels.set_pixel_rgb(y, b, g, r)
-            pixels.show()
-            time.sleep(0.05)
-        return
-
     command = command.lower()
-    if command.endswith(":"):
-        current_command = command[:-1]
-        return
-    elif "*" in command:
+    if "*" in command:
         count, command_name = command.split("*", maxsplit=1)
-        count = int(count)
-        for i in range(count):
-            handle_command(command_name)
-    elif command == "sample":
-        sample = True
-    elif command in COMMANDS:
-        for command_name in COMMANDS[command]:
-            handle_command(command_name)
-    elif command in PATTERNS:
-        for i, (r, g, b) in enumerate(PATTERNS[command]()):
-            pixels.set_pixel_rgb(i, int(b), int(g), int(r))
-    else:
-        r, g, b = webcolors.name_to_rgb(command)
-        for i in range(PIXEL_COUNT):
-            pixels.set_pixel_rgb(i, b, g, r)
+        return (REPEAT, int(count), [compile_command(command_name, macros)])
 
-    pixels.show()
+    if command in macros:
+        return (CALL, command)
 
-# ----------------------------------------------------------------------------
+    if command in PATTERNS:
+        return (SHOW, PATTERNS[command]())
+
+    try:
+        rgb = np.zeros(shape=(PIXEL_COUNT, 3), dtype=np.uint8)
+        rgb[:, :] = webcolors.name_to_rgb(command)
+        return (SHOW, rgb)
+    except ValueError:
+        # Not a color, so it must be a macro defined later
+        return (CALL, command)
 
-if __name__ == "__main__":
-    commands = ["white"]
-    if len(sys.argv) > 1:
-        commands = sys.argv[1:]
 
-    pixels.clear()
+def compile_commands(commands, macros=None):
+    """Compiles commands into a program, resolving colors and patterns once.
 
+    name: ... name. defines a macro, sample PATH plays an image, N*command
+    repeats a command and a decimal sleeps. Unfinished definitions end with
+    the commands.
+    """
+    if macros is None:
+        macros = set(COMMANDS)
+
+    program = []
+    commands = iter(commands)
     for command in commands:
-        handle_command(command)
+        if command.lower() == "sample":
+            path = next(commands, None)
+            if path is None:
+                raise ValueError("sample needs an image path")
+
+            program.append((SAMPLE, path))
+        elif command.endswith(":"):
+            # Collect body until "name."
+            name = command[:-1].lower()
+            body = []
+            for body_command in commands:
+                if body_command.endswith(".") and (body_command[:-1] == name):
+                    break
+
+                body.append(body_command)
+
+            macros.add(name)
+            program.append((DEFINE, name, compile_commands(body, macros)))
+        else:
+            program.append(compile_command(command, macros))
+
+    return program
+
+
+def execute(program, clock):
+    for instruction in program:
+        op = instruction[0]
+        if op == SHOW:
+            pixels.write(instruction[1])
+        elif op == SLEEP:
+            clock.wait(instruction[1])
+        elif op == SAMPLE:
+            play_sample(instruction[1], clock)
+        elif op == REPEAT:
+            for i in range(instruction[1]):
+                execute(instruction[2], clock)
+        elif op == CALL:
+            name = instruction[1]
+            if name not in COMMANDS:
+                raise ValueError("%s is not a color, pattern, or macro" % name)
+
+            execute(COMMANDS[name], clock)
+        elif op == DEFINE:
+            COMMANDS[instruction[1]] = instruction[2]
+
+
+def run_commands(commands):
+    execute(compile_commands(commands), Clock())
+
+
+# ----------------------------------------------------------------------------
+
+def run_daemon(socket_path=SOCKET_PATH):
+    """Runs commands sent by led-on clients one connection at a time, keeping
+    macros between calls"""
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(5)
+    print("Listening on %s" % socket_path, file=sys.stderr)
+
+    try:
+        while True:
+            client, _ = server.accept()
+            with client:
+                request = b""
+                while True:
+                    data = client.recv(4096)
+                    if not data:
+                        break
+
+                    request += data
+
+                try:
+                    request = json.loads(request.decode())
+                    os.chdir(request.get("cwd", os.getcwd()))
+                    run_commands(request["commands"])
+
+                    reply = {"ok": True}
+                except Exception as e:
+                    reply = {"error": "%s: %s" % (type(e).__name__, e)}
+
+                try:
+                    client.sendall(json.dumps(reply).encode())
+                except OSError:
+                    pass  # client went away
+    finally:
+        server.close()
+        os.remove(socket_path)
+
+
+if __name__ == "__main__":
+    if "--daemon" in sys.argv[1:]:
+        run_daemon()
+    else:
+        commands = ["white"]
+        if len(sys.argv) > 1:
+            commands = sys.argv[1:]
+
+        run_commands(commands)
@@ -0,0 +1,173 @@
+"""Encode-once fan-out of pixel frames to WebSocket subscribers."""
+import json
+import time
+import struct
+import collections
+
+import gevent
+import gevent.event
+import numpy as np
+
+import delta
+
+# -----------------------------------------------------------------------------
+
+# Header for binary frames: frame number, pixel count, timestamp (seconds)
+FRAME_HEADER = struct.Struct("<IId")
+
+
+def encode_json(version, timestamp, rgb):
+    """List of { "i": 0, "r": 255, "g": 0, "b": 0 } objects"""
+    colors = [
+        {"i": i, "r": int(r), "g": int(g), "b": int(b)}
+        for i, (r, g, b) in enumerate(rgb.tolist())
+    ]
+
+    return json.dumps(colors)
+
+
+def encode_bin(version, timestamp, rgb):
+    """Raw RGB bytes, 3 per pixel"""
+    return rgb.tobytes()
+
+
+def encode_bin_header(version, timestamp, rgb):
+    """FRAME_HEADER followed by raw RGB bytes"""
+    return (
+        FRAME_HEADER.pack(version % (2 ** 32), rgb.shape[0], timestamp)
+        + rgb.tobytes()
+    )
+
+
+def encode_keyframe(version, timestamp, rgb):
+    """delta.DELTA_HEADER followed by a range of all pixels"""
+    return delta.encode_keyframe(version, rgb)
+
+
+ENCODERS = {
+    "json": encode_json,
+    "bin": encode_bin,
+    "bin_header": encode_bin_header,
+    "keyframe": encode_keyframe,
+}
+
+# Recent frames kept as bases for deltas
+HISTORY_SIZE = 16
+
+# -----------------------------------------------------------------------------
+
+
+class FrameBroadcaster:
+    """Holds the latest frame and serializes it at most once per format.
+
+    Subscribers always send the newest frame, so slow clients skip
+    intermediate frames instead of queueing them.
+    """
+
+    def __init__(self, encoders=ENCODERS):
+        self.encoders = encoders
+        self.version = 0
+        self.timestamp = 0
+        self.rgb = np.zeros(shape=(0, 3), dtype=np.uint8)
+        self.history = collections.OrderedDict()
+        self._encoded = {}
+        self._event = gevent.event.Event()
+
+    def publish(self, rgb):
+        """Makes a copy of rgb the latest frame and wakes up subscribers"""
+        self.rgb = np.array(rgb, dtype=np.uint8)
+        self.timestamp = time.time()
+        self._encoded = {}
+        self.version += 1
+
+        self.history[self.version] = self.rgb
+        while len(self.history) > HISTORY_SIZE:
+            self.history.popitem(last=False)
+
+        self._event.set()
+        self._event.clear()
+
+    def get_frame(self, format="json"):
+        """Returns the latest frame serialized in a format, encoding it only for
+        the first subscriber that asks"""
+        encoded = self._encoded
+        frame = encoded.get(format)
+        if frame is None:
+            frame = self.encoders[format](self.version, self.timestamp, self.rgb)
+            encoded[format] = frame
+
+        return frame
+
+    def get_delta(self, base_version):
+        """Returns the latest frame as a delta against base_version (or a
+        keyframe if that frame is no longer kept), encoded once per base"""
+        base_rgb = self.history.get(base_version)
+        if base_rgb is None:
+            return self.get_frame("keyframe")
+
+        key = ("delta", base_version)
+        frame = self._encoded.get(key)
+        if frame is None:
+            frame = delta.encode_delta(self.version, base_version, base_rgb, self.rgb)
+            self._encoded[key] = frame
+
+        return frame
+
+    def wait(self, last_version=None, timeout=None):
+        """Blocks until there is a frame newer than last_version (or timeout
+        seconds pass) and returns the latest version"""
+        while self.version == last_version:
+            if not self._event.wait(timeout):
+                break
+
+        return self.version
+
+    def serve(self, ws, format="json"):
+        """Sends the latest frame to a WebSocket until it closes"""
+        if format == "delta":
+            self.serve_delta(ws)
+            return
+
+        version = None
+        while not ws.closed:
+            version = self.wait(version)
+            ws.send(self.get_frame(format))
+
+    def serve_delta(self, ws, keyframe_interval=delta.KEYFRAME_INTERVAL):
+        """Sends a keyframe, then deltas against the last frame sent. Another
+        keyframe follows every keyframe_interval frames or when the client
+        sends "keyframe"."""
+        keyframe_requested = True
+
+        def read_requests():
+            nonlocal keyframe_requested
+            while not ws.closed:
+                message = ws.receive()
+                if message is None:
+                    break
+
+                if message == "keyframe":
+                    keyframe_requested = True
+
+        reader = gevent.spawn(read_requests)
+        version = None
+        since_keyframe = 0
+        try:
+            while not ws.closed:
+                # Wake up now and then to answer keyframe requests
+                latest_version = self.wait(version, timeout=0.5)
+                if (latest_version == version) and (not keyframe_requested):
+                    continue
+
+                if keyframe_requested or (since_keyframe >= keyframe_interval):
+                    frame = self.get_frame("keyframe")
+                    keyframe_requested = False
+                    since_keyframe = 0
+                else:
+                    frame = self.get_delta(version)
+                    since_keyframe += 1
+
+                version = latest_version
+                ws.send(frame)
+        finally:
+            reader.kill()
@@ -0,0 +1,324 @@
+"""Vectorized colorspace conversions for whole pixel arrays.
+
+Mirrors the colormath conversions used by server.py and game_gui.py, but
+operates on an (N, 3) array in one call instead of one color object per pixel.
+"""
+import os
+import logging
+
+import numpy as np
+
+# -----------------------------------------------------------------------------
+
+# Source colorspaces understood by to_srgb
+COLORSPACES = ["rgb", "xyz", "hsl", "cmy", "ipt"]
+
+# sRGB working space (D65)
+XYZ_TO_RGB = np.array(
+    [
+        [3.24071, -1.53726, -0.498571],
+        [-0.969258, 1.87599, 0.0415557],
+        [0.0556352, -0.203996, 1.05707],
+    ]
+)
+
+# IPT (Ebner & Fairchild)
+XYZ_TO_LMS = np.array(
+    [[0.4002, 0.7075, -0.0807], [-0.228, 1.15, 0.0612], [0.0, 0.0, 0.9184]]
+)
+
+LMS_TO_IPT = np.array(
+    [[0.4, 0.4, 0.2], [4.455, -4.851, 0.396], [0.8056, 0.3572, -1.1628]]
+)
+
+IPT_TO_LMS = np.linalg.inv(LMS_TO_IPT)
+LMS_TO_XYZ = np.linalg.inv(XYZ_TO_LMS)
+
+# Bradford chromatic adaptation from D50 (colormath's XYZ default) to D65
+BRADFORD = np.array(
+    [[0.8951, 0.2664, -0.1614], [-0.7502, 1.7135, 0.0367], [0.0389, -0.0685, 1.0296]]
+)
+
+WHITE_D50 = np.array([0.96422, 1.0, 0.82521])
+WHITE_D65 = np.array([0.95047, 1.0, 1.08883])
+
+
+def _adaptation_matrix(white_src, white_dst):
+    """Returns the Bradford matrix adapting XYZ from one white point to another"""
+    ratio = np.diag(BRADFORD.dot(white_dst) / BRADFORD.dot(white_src))
+    return np.linalg.pinv(BRADFORD).dot(ratio).dot(BRADFORD)
+
+
+D50_TO_D65 = _adaptation_matrix(WHITE_D50, WHITE_D65)
+
+# XYZ (D50) straight to linear sRGB
+XYZ_D50_TO_RGB = XYZ_TO_RGB.dot(D50_TO_D65)
+
+# -----------------------------------------------------------------------------
+
+
+def _apply_matrix(values, matrix):
+    """Multiplies every row of an (N, 3) array by a 3x3 matrix"""
+    return values.dot(matrix.T)
+
+
+def linear_to_srgb(linear):
+    """Applies the sRGB companding curve (negative values are clamped to 0)"""
+    linear = np.maximum(linear, 0.0)
+    return np.where(
+        linear <= 0.0031308, linear * 12.92, 1.055 * (linear ** (1 / 2.4)) - 0.055
+    )
+
+
+def xyz_to_srgb(xyz):
+    """Converts D50 XYZ values to sRGB (0-1)"""
+    return linear_to_srgb(_apply_matrix(xyz, XYZ_D50_TO_RGB))
+
+
+def cmy_to_srgb(cmy):
+    """Converts CMY values (0-1) to sRGB (0-1)"""
+    return 1.0 - cmy
+
+
+def ipt_to_srgb(ipt):
+    """Converts IPT values to sRGB (0-1)"""
+    lms = _apply_matrix(ipt, IPT_TO_LMS)
+    lms = np.sign(lms) * (np.abs(lms) ** (1 / 0.43))
+    xyz = _apply_matrix(lms, LMS_TO_XYZ)
+
+    # IPT is already D65, so no adaptation is needed
+    return linear_to_srgb(_apply_matrix(xyz, XYZ_TO_RGB))
+
+
+def _hsl_component(q, p, c):
+    """Vectorized version of colormath's HSL to RGB channel calculation"""
+    c = np.where(c < 0, c + 1.0, c)
+    c = np.where(c > 1, c - 1.0, c)
+
+    return np.select(
+        [c < (1.0 / 6.0), c < 0.5, c < (2.0 / 3.0)],
+        [p + ((q - p) * 6.0 * c), q, p + ((q - p) * 6.0 * ((2.0 / 3.0) - c))],
+        default=p,
+    )
+
+
+def hsl_to_rgb(hsl):
+    """Converts HSL values (hue in degrees) to RGB in the same scale as L"""
+    hsl = np.asarray(hsl, dtype=float)
+    h, s, l = hsl[..., 0], hsl[..., 1], hsl[..., 2]
+
+    q = np.where(l < 0.5, l * (1.0 + s), l + s - (l * s))
+    p = 2.0 * l - q
+    h = h / 360.0
+
+    return np.stack(
+        [
+            _hsl_component(q, p, h + (1.0 / 3.0)),
+            _hsl_component(q, p, h),
+            _hsl_component(q, p, h - (1.0 / 3.0)),
+        ],
+        axis=-1,
+    )
+
+
+def rgb_to_hsl(rgb):
+    """Converts RGB values to HSL (hue in degrees, S/L in the same scale as RGB).
+
+    Raises FloatingPointError where colormath would divide by zero.
+    """
+    rgb = np.asarray(rgb, dtype=float)
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+
+    var_max = rgb.max(axis=-1)
+    var_min = rgb.min(axis=-1)
+    delta = var_max - var_min
+    gray = delta == 0
+    safe_delta = np.where(gray, 1.0, delta)
+
+    # Hue (red wins ties, then green, then blue)
+    h = np.select(
+        [gray, var_max == r, var_max == g],
+        [
+            0.0,
+            (60.0 * ((g - b) / safe_delta) + 360) % 360.0,
+            60.0 * ((b - r) / safe_delta) + 120,
+        ],
+        default=60.0 * ((r - g) / safe_delta) + 240.0,
+    )
+
+    l = 0.5 * (var_max + var_min)
+
+    # Saturation
+    s_denom = np.where(l <= 0.5, 2.0 * l, 2.0 - (2.0 * l))
+    if np.any(s_denom[~gray] == 0):
+        raise FloatingPointError("division by zero in RGB to HSL conversion")
+
+    s = np.where(gray, 0.0, delta / np.where(gray, 1.0, s_denom))
+
+    return np.stack([h, s, l], axis=-1)
+
+
+def to_float_srgb(values, source="rgb"):
+    """Interprets values (0-1) as colors in the source colorspace and converts
+    them to sRGB (0-1)"""
+    values = np.asarray(values, dtype=float)
+
+    if source == "xyz":
+        return xyz_to_srgb(values)
+    elif source == "hsl":
+        return hsl_to_rgb(values)
+    elif source == "cmy":
+        return cmy_to_srgb(values)
+    elif source == "ipt":
+        return ipt_to_srgb(values)
+
+    return values
+
+
+def _to_srgb_bytes(values, source):
+    """Converts source values (0-255) to sRGB, truncated like int() and clamped
+    to 0-255"""
+    srgb = to_float_srgb(np.asarray(values) / 255, source)
+    srgb = np.trunc(np.nan_to_num(srgb * 255))
+    np.clip(srgb, 0, 255, out=srgb)
+
+    return srgb
+
+
+def to_srgb(rgb, source="rgb", out=None, lut=None):
+    """Converts an (N, 3) uint8 array of source colorspace values to uint8 sRGB.
+
+    Each byte is scaled to 0-1 and treated as a component of the source
+    colorspace, matching the per-pixel colormath conversion it replaces.
+    If a lookup table from load_lut is given, it is used instead of the math.
+    """
+    if out is None:
+        out = np.empty(np.shape(rgb), dtype=np.uint8)
+
+    if source not in COLORSPACES or source == "rgb":
+        out[...] = rgb
+    elif lut is not None:
+        apply_lut(lut, rgb, out=out)
+    else:
+        out[...] = _to_srgb_bytes(rgb, source)
+
+    return out
+
+
+# -----------------------------------------------------------------------------
+
+# (source, bits, interpolate) -> loaded lookup table
+_luts = {}
+
+
+def build_lut(source, bits=8, interpolate=False):
+    """Builds a table of uint8 sRGB values indexed by the top bits of each
+    source channel.
+
+    Nearest tables are (2^bits, 2^bits, 2^bits, 3), and each cell holds the
+    conversion of the center of its range. With 8 bits the table is exact
+    (48 MB), and every bit less divides the memory by 8. Interpolated tables
+    hold the 2^bits + 1 grid points from 0 to 255 per channel instead (33^3
+    for 5 bits), for apply_lut to blend between.
+    """
+    if not 1 <= bits <= 8:
+        raise ValueError("LUT bits must be in 1-8 (%s)" % bits)
+
+    size = 1 << bits
+    if interpolate:
+        grid = np.linspace(0, 255, size + 1)
+    else:
+        step = 256 // size
+        grid = (np.arange(size) * step) + ((step - 1) / 2)
+
+    nodes = len(grid)
+    lut = np.zeros(shape=(nodes, nodes, nodes, 3), dtype=np.uint8)
+
+    # One red plane at a time to keep memory down
+    g, b = np.meshgrid(grid, grid, indexing="ij")
+    plane = np.stack([np.zeros_like(g), g, b], axis=-1).reshape(-1, 3)
+    for r_idx, r in enumerate(grid):
+        plane[:, 0] = r
+        lut[r_idx] = _to_srgb_bytes(plane, source).reshape(nodes, nodes, 3)
+
+    return lut
+
+
+def lut_path(lut_dir, source, bits, interpolate=False):
+    """Path of the cached lookup table for a colorspace and bit depth"""
+    suffix = "-trilinear" if interpolate else ""
+    return os.path.join(lut_dir, "%s-%sbit%s.npy" % (source, bits, suffix))
+
+
+def load_lut(source, bits=8, lut_dir=None, interpolate=False):
+    """Loads the lookup table for a source colorspace, building and saving it to
+    lut_dir first if needed. Saved tables are memory-mapped from disk."""
+    key = (source, bits, interpolate)
+    if key in _luts:
+        return _luts[key]
+
+    if lut_dir is None:
+        logging.debug("Building %s-bit lookup table for %s" % (bits, source))
+        lut = build_lut(source, bits, interpolate)
+    else:
+        path = lut_path(lut_dir, source, bits, interpolate)
+        if not os.path.exists(path):
+            logging.debug("Building %s-bit lookup table for %s" % (bits, source))
+            os.makedirs(lut_dir, exist_ok=True)
+            temp_path = path + ".tmp"
+            with open(temp_path, "wb") as lut_file:
+                np.save(lut_file, build_lut(source, bits, interpolate))
+
+            os.replace(temp_path, path)
+
+        lut = np.load(path, mmap_mode="r")
+
+    _luts[key] = lut
+    return lut
+
+
+def apply_lut(lut, rgb, out=None):
+    """Looks up (N, 3) uint8 colors in a table from build_lut/load_lut"""
+    rgb = np.asarray(rgb, dtype=np.uint8)
+    if out is None:
+        out = np.empty(rgb.shape, dtype=np.uint8)
+
+    # Interpolated tables have an odd number of grid points per channel
+    if lut.shape[0] % 2:
+        return _apply_lut_trilinear(lut, rgb, out)
+
+    # Keep only the top bits of each channel
+    bits = lut.shape[0].bit_length() - 1
+    idx = (rgb >> (8 - bits)).astype(np.intp)
+    flat_idx = (((idx[:, 0] << bits) | idx[:, 1]) << bits) | idx[:, 2]
+    np.take(lut.reshape(-1, 3), flat_idx, axis=0, out=out)
+
+    return out
+
+
+def _apply_lut_trilinear(lut, rgb, out):
+    """Blends the 8 grid points around each color by their distance"""
+    cells = lut.shape[0] - 1
+    nodes = cells + 1
+    position = rgb * np.float32(cells / 255)
+    low = np.minimum(position.astype(np.intp), cells - 1)
+    high_weight = position - low
+    low_weight = 1 - high_weight
+
+    flat_lut = lut.reshape(-1, 3)
+    base_idx = (((low[:, 0] * nodes) + low[:, 1]) * nodes) + low[:, 2]
+    total = np.zeros(rgb.shape, dtype=np.float32)
+    for dr in (0, 1):
+        r_weight = (high_weight if dr else low_weight)[:, 0]
+        for dg in (0, 1):
+            rg_weight = r_weight * (high_weight if dg else low_weight)[:, 1]
+            for db in (0, 1):
+                weight = rg_weight * (high_weight if db else low_weight)[:, 2]
+                corner_idx = base_idx + (((dr * nodes) + dg) * nodes) + db
+                corner = np.take(flat_lut, corner_idx, axis=0)
+                total += weight[:, np.newaxis] * corner
+
+    np.rint(total, out=total)
+    out[...] = total
+
+    return out
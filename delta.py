@@ -0,0 +1,141 @@
+"""Delta frames: only the pixel ranges that changed since a base frame.
+
+Wire format (little endian):
+    DELTA_HEADER: kind (b"K" keyframe or b"D" delta), frame number, base frame
+                  number, pixel count, number of ranges
+    ranges: RANGE_HEADER (start pixel, pixel count) followed by RGB bytes
+
+A keyframe is a single range covering every pixel, so both kinds are applied
+the same way. Deltas only make sense on top of the base frame.
+"""
+import struct
+
+import numpy as np
+
+# -----------------------------------------------------------------------------
+
+DELTA_HEADER = struct.Struct("<cIIII")
+RANGE_HEADER = struct.Struct("<II")
+
+KEYFRAME = b"K"
+DELTA = b"D"
+
+# Unchanged gaps this short are sent rather than starting a new range
+MERGE_GAP = 2
+
+# Deltas are followed by a keyframe after this many frames
+KEYFRAME_INTERVAL = 300
+
+
+def changed_ranges(base_rgb, rgb, merge_gap=MERGE_GAP):
+    """Returns (starts, stops) of the runs of pixels that differ"""
+    # Only the changed pixels are worked on after one flat comparison
+    changed = np.flatnonzero(np.ravel(base_rgb) != np.ravel(rgb)) // 3
+    if len(changed) == 0:
+        return changed, changed
+
+    # Runs separated by short gaps are merged
+    breaks = np.flatnonzero(np.diff(changed) > (merge_gap + 1))
+    starts = changed[np.concatenate([[0], breaks + 1])]
+    stops = changed[np.concatenate([breaks, [len(changed) - 1]])] + 1
+
+    return starts, stops
+
+
+def encode_keyframe(version, rgb):
+    version = version % (2 ** 32)
+    return b"".join(
+        [
+            DELTA_HEADER.pack(KEYFRAME, version, version, len(rgb), 1),
+            RANGE_HEADER.pack(0, len(rgb)),
+            np.asarray(rgb, dtype=np.uint8).tobytes(),
+        ]
+    )
+
+
+def encode_delta(version, base_version, base_rgb, rgb):
+    """Encodes rgb against base_rgb (a keyframe if that's not smaller).
+
+    This costs more CPU than sending the whole frame (rgb.tobytes()), in
+    exchange for fewer bytes on the wire when little has changed.
+    """
+    if (base_rgb is None) or (base_rgb.shape != rgb.shape):
+        return encode_keyframe(version, rgb)
+
+    starts, stops = changed_ranges(base_rgb, rgb)
+    counts = stops - starts
+    changed_count = int(np.sum(counts))
+    range_size = RANGE_HEADER.size
+    if (changed_count * 3) + (len(starts) * range_size) >= len(rgb) * 3:
+        return encode_keyframe(version, rgb)
+
+    # Byte offset of each range, then of each changed pixel
+    pixel_offsets = np.cumsum(counts) - counts
+    range_offsets = (np.arange(len(starts)) * range_size) + (pixel_offsets * 3)
+    within = np.arange(changed_count) - np.repeat(pixel_offsets, counts)
+    pixel_indexes = np.repeat(starts, counts) + within
+    pixel_bytes = np.repeat(range_offsets + range_size, counts) + (within * 3)
+
+    body = np.empty(len(starts) * range_size + changed_count * 3, dtype=np.uint8)
+    headers = np.empty(shape=(len(starts), 2), dtype="<u4")
+    headers[:, 0], headers[:, 1] = starts, counts
+    body[range_offsets[:, np.newaxis] + np.arange(range_size)] = headers.view(
+        np.uint8
+    ).reshape((-1, range_size))
+    body[pixel_bytes[:, np.newaxis] + np.arange(3)] = rgb[pixel_indexes]
+
+    header = DELTA_HEADER.pack(
+        DELTA, version % (2 ** 32), base_version % (2 ** 32), len(rgb), len(starts)
+    )
+
+    return header + body.tobytes()
+
+
+def read_frame(data):
+    """Checks a keyframe or delta and returns (kind, frame number, base frame
+    number, ranges), where ranges are (start pixel, (count, 3) colors).
+    Raises ValueError if the frame is malformed."""
+    if len(data) < DELTA_HEADER.size:
+        raise ValueError("Frame is shorter than its header")
+
+    kind, version, base_version, pixel_count, range_count = DELTA_HEADER.unpack_from(
+        data
+    )
+
+    if kind not in (KEYFRAME, DELTA):
+        raise ValueError("Unknown frame kind %r" % kind)
+
+    ranges = []
+    offset = DELTA_HEADER.size
+    for _ in range(range_count):
+        if offset + RANGE_HEADER.size > len(data):
+            raise ValueError("Frame ends before range %s" % len(ranges))
+
+        start, count = RANGE_HEADER.unpack_from(data, offset)
+        offset += RANGE_HEADER.size
+
+        if offset + (count * 3) > len(data):
+            raise ValueError("Frame ends inside range %s" % len(ranges))
+
+        values = np.frombuffer(data, dtype=np.uint8, count=count * 3, offset=offset)
+        ranges.append((start, values.reshape((count, 3))))
+        offset += count * 3
+
+    return kind, version, base_version, ranges
+
+
+def apply_ranges(rgb, ranges):
+    """Copies ranges from read_frame into rgb (clipped to its length)"""
+    for start, values in ranges:
+        stop = min(start + len(values), len(rgb))
+        if start < stop:
+            rgb[start:stop] = values[: stop - start]
+
+
+def apply_frame(rgb, data):
+    """Copies the ranges of a keyframe or delta into rgb (clipped to its
+    length). Returns (kind, frame number, base frame number)."""
+    kind, version, base_version, ranges = read_frame(data)
+    apply_ranges(rgb, ranges)
+
+    return kind, version, base_version
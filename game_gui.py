@@ -2,6 +2,8 @@
 import os
 import sys
 import time
+import shutil
+import tempfile
 import queue
 from queue import Queue
 import argparse
@@ -10,32 +12,43 @@ import tkinter as tk
 import tkinter.filedialog as filedialog
 from tkinter import ttk
 import logging
-import itertools
 import collections
+import collections.abc
 
 logging.basicConfig(level=logging.DEBUG)
 logging.getLogger("urllib3.connectionpool").setLevel(logging.WARN)
-logging.getLogger("colormath.color_conversions").setLevel(logging.WARN)
 
 import numpy as np
 import pygame
-import requests
-from PIL import Image
 
-from colormath.color_conversions import convert_color
-from colormath.color_objects import sRGBColor, XYZColor, HSLColor, CMYColor
-
-# Number of pixels in the LED strip
-PIXEL_COUNT = 32
+import colorspace
+import patterns
+import sequence
 
 # -----------------------------------------------------------------------------
 
 parser = argparse.ArgumentParser("game_gui.py")
 parser.add_argument("--no-pi", action="store_true", help="Disable LED strip on pi")
+parser.add_argument(
+    "--pixel-count", default=32, type=int, help="Number of pixels in the LED strip"
+)
+
+parser.add_argument(
+    "--server", default="http://localhost:5000", help="URL of server.py (--no-pi)"
+)
+parser.add_argument(
+    "--transport",
+    default="websocket",
+    choices=["websocket", "http"],
+    help="How frames are sent to server.py (--no-pi)",
+)
 
 args = parser.parse_args()
 logging.debug(args)
 
+# Number of pixels in the LED strip
+PIXEL_COUNT = args.pixel_count
+
 # -----------------------------------------------------------------------------
 
 # Index to button name
@@ -143,15 +156,16 @@ TRIGGER_OPS = {"lt": "RollL", "rt": "RollR"}
 # Delay between animation frames
 ANIMATION_DELAY = 0.05
 
-# Function called every frame to transform pixels
+# Resolution of recorded frame timestamps (shortest animation delay)
+RECORD_SECONDS = 0.01
+
+# Function called every frame to transform pixels (when not rolling)
 ANIMATION_STEP = lambda x: x
 
-# -------------------------------------------------------------------------
+# Milliseconds between TK updates from the Pygame thread
+UI_TICK_MS = 30
 
-# True if colors are being recorded to an image
-recording = False
-playing = False
-record_buffer = []
+# -------------------------------------------------------------------------
 
 
 class Application(tk.Frame):
@@ -161,8 +175,13 @@ class Application(tk.Frame):
         self.pack()
         self.create_widgets()
 
+        # Current style of each combo box and title/menu color
+        self.styles = {}
+        self.status = None
+
+        # Highlight changes (combo box name -> on) from Pygame thread
         self.queue = Queue()
-        self.master.after(100, self.process_queue)
+        self.master.after(UI_TICK_MS, self.process_queue)
 
     def create_widgets(self):
         self.menubar = tk.Menu(self.master, tearoff=0)
@@ -199,43 +218,62 @@ class Application(tk.Frame):
     # -------------------------------------------------------------------------
 
     def file_open(self):
-        global playing, record_buffer
         try:
             file_name = filedialog.askopenfilename(
                 parent=self,
                 initialdir=os.getcwd(),
-                title="Select an image",
-                filetypes=(("Image Files", "*.png *.jpg *.jpeg"), ("All Files", "*.*")),
+                title="Select an image or sequence",
+                filetypes=(
+                    ("Image Files", "*.png *.jpg *.jpeg"),
+                    ("Sequence Files", "*.seq"),
+                    ("All Files", "*.*"),
+                ),
             )
 
             if file_name:
                 logging.debug("Loading %s" % file_name)
-                record_img = Image.open(file_name)
-                record_buffer = list(
-                    reversed((np.swapaxes(np.array(record_img), 0, 1)).tolist())
-                )
-                logging.info("Playing back %s frame(s)" % len(record_buffer))
-                recording = False
-                playing = True
+                playback = sequence.load_frames(file_name, ANIMATION_DELAY)
+                logging.info("Playing back %s frame(s)" % len(playback))
+                state.start_playback(playback)
         except Exception as e:
             logging.exception("file_save")
 
     def file_save(self):
-        global record_buffer
         try:
             file_name = filedialog.asksaveasfilename(
                 parent=self,
                 initialdir=os.getcwd(),
-                title="Save image",
-                filetypes=(("Image Files", "*.png"), ("All Files", "*.*")),
+                title="Save image or sequence",
+                filetypes=(
+                    ("Image Files", "*.png"),
+                    ("Sequence Files", "*.seq"),
+                    ("All Files", "*.*"),
+                ),
             )
 
             if file_name:
                 logging.debug("Saving %s" % file_name)
-                record_array = np.hstack(record_buffer).reshape(
-                    (PIXEL_COUNT, len(record_buffer), 3)
-                )
-                Image.fromarray(record_array, mode="RGB").save(file_name)
+                with state.lock:
+                    state.stop_recording()
+                    state.publish()
+
+                    recorder = state.recorder
+                    if file_name.endswith(".seq"):
+                        # Moved (not deleted by the next recording)
+                        state.recorder = None
+
+                if recorder is None:
+                    logging.warning("Nothing recorded")
+                elif file_name.endswith(".seq"):
+                    # Already on disk
+                    shutil.move(recorder.path, file_name)
+                else:
+                    # One column per default frame
+                    recorded = sequence.open_sequence(recorder.path)
+                    sequence.write_png_frames(
+                        file_name,
+                        recorded.to_array(sequence.DEFAULT_FRAME_SECONDS),
+                    )
         except Exception as e:
             logging.exception("file_save")
 
@@ -281,78 +319,40 @@ class Application(tk.Frame):
     # -------------------------------------------------------------------------
 
     def process_queue(self):
-        """Process incoming events from Pygame thread"""
-        global recording, playing
+        """Apply highlight changes from Pygame thread (once per tick)"""
         try:
-            while True:
-                # Show recording status
-                if recording:
-                    self.master.title("LEGACY (Recording)")
-                    self.menubar["background"] = "red"
-                elif playing:
-                    self.master.title("LEGACY (Playing)")
-                    self.menubar["background"] = "green"
-                else:
-                    self.master.title("LEGACY")
-                    self.menubar["background"] = self.menubar_bg
-
-                # Throws queue.Empty when empty
-                event = self.queue.get_nowait()
-
-                # Process event
-                if event.type in [pygame.JOYBUTTONDOWN, pygame.JOYBUTTONUP]:
-                    # Button up/down
-                    combo_name = BUTTONS.get(event.button, None)
-                    if combo_name:
-                        # Highlight combo box
-                        combo = self.combos[combo_name]
-                        if event.type == pygame.JOYBUTTONDOWN:
-                            combo["style"] = "Red.TCombobox"
-                        elif event.type == pygame.JOYBUTTONUP:
-                            combo["style"] = "TCombobox"
-                elif event.type == pygame.JOYAXISMOTION:
-                    # Stick movement
-                    combo_name = AXES.get(event.axis, None)
-                    if combo_name:
-                        # Highlight combo box
-                        combo = self.combos[combo_name]
-                        if (event.value < -0.1) or (event.value > 0.1):
-                            combo["style"] = "Red.TCombobox"
-                        else:
-                            combo["style"] = "TCombobox"
-                    else:
-                        # Highlight combo box
-                        combo_name = TRIGGERS.get(event.axis, None)
-                        if combo_name:
-                            combo = self.combos[combo_name]
-                            if event.value > -0.9:
-                                combo["style"] = "Red.TCombobox"
-                            else:
-                                combo["style"] = "TCombobox"
-                elif event.type == pygame.JOYHATMOTION:
-                    # Hat (d-pad) up/down
-                    if event.value == (0, 0):
-                        # No buttons pressed
-                        for name in ["up", "down", "left", "right"]:
-                            self.combos[name]["style"] = "TCombobox"
-                    else:
-                        # Vertical
-                        if event.value == (0, 1):
-                            self.combos["up"]["style"] = "Red.TCombobox"
-                        elif event.value == (0, -1):
-                            self.combos["down"]["style"] = "Red.TCombobox"
-
-                        # Horizontal
-                        if event.value == (1, 0):
-                            self.combos["right"]["style"] = "Red.TCombobox"
-                        elif event.value == (-1, 0):
-                            self.combos["left"]["style"] = "Red.TCombobox"
-        except queue.Empty:
-            pass
+            # Show recording status
+            controls = state.controls
+            if controls.recorder is not None:
+                status = ("LEGACY (Recording)", "red")
+            elif controls.playback is not None:
+                status = ("LEGACY (Playing)", "green")
+            else:
+                status = ("LEGACY", self.menubar_bg)
+
+            if status != self.status:
+                self.master.title(status[0])
+                self.menubar["background"] = status[1]
+                self.status = status
+
+            # Merge everything queued since last tick
+            changes = {}
+            try:
+                while True:
+                    changes.update(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            # Only touch combo boxes whose style changed
+            for combo_name, on in changes.items():
+                style = "Red.TCombobox" if on else "TCombobox"
+                if self.styles.get(combo_name, "TCombobox") != style:
+                    self.combos[combo_name]["style"] = style
+                    self.styles[combo_name] = style
         except Exception as e:
             logging.exception("process_queue")
         finally:
-            self.master.after(100, self.process_queue)
+            self.master.after(UI_TICK_MS, self.process_queue)
 
 
 # -----------------------------------------------------------------------------
@@ -376,107 +376,248 @@ def pygame_run(app):
     js = joysticks[0]
     js.init()
 
+    # Last value handled for each axis and highlight sent for each combo box
+    axis_values = {}
+    highlights = {}
+
     while True:
         try:
-            # Wait here until first event arruves
-            events = [pygame.event.wait()]
-            for event in events + pygame.event.get():
-                # Check if this is an event we care about
-                if event.type in [
-                    pygame.JOYBUTTONUP,
-                    pygame.JOYBUTTONDOWN,
-                    pygame.JOYAXISMOTION,
-                    pygame.JOYHATMOTION,
-                ]:
-                    # Forward to TK app
-                    app.queue.put(event)
-                    # logging.debug(event)
-
-                    if event.type in [pygame.JOYBUTTONDOWN, pygame.JOYBUTTONUP]:
-                        # Button up/down
-                        button_name = BUTTONS.get(event.button, "")
-                        op = BUTTON_OPS.get(button_name, None)
-                        if op:
-                            on = event.type == pygame.JOYBUTTONDOWN
-                            do_discrete_op(button_name, op, on=on)
-                    elif event.type == pygame.JOYHATMOTION:
-                        # HAT (d-pad) button
-                        if event.value == (0, 0):
-                            # No buttons pressed
-                            for hat_name in HATS.values():
-                                op = BUTTON_OPS.get(hat_name, None)
-                                if op:
-                                    do_discrete_op(hat_name, op, on=False)
-                        else:
-                            # Button pressed
-                            hat_name = HATS.get(event.value, "")
-                            op = BUTTON_OPS.get(hat_name, None)
-                            if op:
-                                do_discrete_op(hat_name, op, on=True)
-                    if event.type == pygame.JOYAXISMOTION:
-                        # Stick motion
-                        if event.axis in TRIGGERS:
-                            axis_name = TRIGGERS.get(event.axis, "")
-                            value = (event.value + 1) / 2
-                        else:
-                            axis_name = AXES.get(event.axis, "")
-                            value = event.value
-
-                        op = AXIS_OPS.get(axis_name, None)
-                        if op:
-                            do_cont_op(axis_name, op, value)
+            # Wait here until first event arrives, then take all queued events
+            events = [pygame.event.wait()] + pygame.event.get()
+            changes = handle_events(events, axis_values, highlights)
+            if changes:
+                # Forward to TK app
+                app.queue.put(changes)
         except Exception as e:
             logging.exception("pygame_run")
 
 
+def handle_events(events, axis_values, highlights):
+    """Does the operations for a batch of events.
+
+    Buttons and hats are handled in order and published to the animation
+    thread at once. Axis values are only kept (latest per axis) for the
+    animation thread to apply once per frame, since a wakeup usually brings
+    a single stick event. Returns the combo box highlights that changed
+    (name -> on).
+    """
+    with state.lock:
+        changes, discrete_ops = _handle_events(events, axis_values)
+        if discrete_ops:
+            state.publish()
+
+    # Only send highlights that changed
+    changes = {
+        name: on for name, on in changes.items() if highlights.get(name, False) != on
+    }
+    highlights.update(changes)
+
+    return changes
+
+
+def _handle_events(events, axis_values):
+    changes = {}
+    axis_events = {}
+    discrete_ops = 0
+    for event in events:
+        if event.type in [pygame.JOYBUTTONDOWN, pygame.JOYBUTTONUP]:
+            # Button up/down
+            button_name = BUTTONS.get(event.button)
+            if button_name:
+                on = event.type == pygame.JOYBUTTONDOWN
+                changes[button_name] = on
+
+                op = BUTTON_OPS.get(button_name, None)
+                if op:
+                    state.do_discrete_op(button_name, op, on=on)
+                    discrete_ops += 1
+        elif event.type == pygame.JOYHATMOTION:
+            # HAT (d-pad) button
+            if event.value == (0, 0):
+                # No buttons pressed
+                for hat_name in HATS.values():
+                    changes[hat_name] = False
+
+                    op = BUTTON_OPS.get(hat_name, None)
+                    if op:
+                        state.do_discrete_op(hat_name, op, on=False)
+                        discrete_ops += 1
+            else:
+                # Button pressed
+                hat_name = HATS.get(event.value)
+                if hat_name:
+                    changes[hat_name] = True
+
+                    op = BUTTON_OPS.get(hat_name, None)
+                    if op:
+                        state.do_discrete_op(hat_name, op, on=True)
+                        discrete_ops += 1
+        elif event.type == pygame.JOYAXISMOTION:
+            # Stick motion (newest value wins)
+            axis_events[event.axis] = event.value
+
+    for axis, event_value in axis_events.items():
+        if axis_values.get(axis) == event_value:
+            continue
+
+        axis_values[axis] = event_value
+        if axis in TRIGGERS:
+            axis_name = TRIGGERS[axis]
+            value = (event_value + 1) / 2
+            changes[axis_name] = event_value > -0.9
+        elif axis in AXES:
+            axis_name = AXES[axis]
+            value = event_value
+            changes[axis_name] = (event_value < -0.1) or (event_value > 0.1)
+        else:
+            continue
+
+        op = AXIS_OPS.get(axis_name, None)
+        if op:
+            state.set_axis(axis_name, op, value)
+
+    return changes, discrete_ops
+
+
 # -----------------------------------------------------------------------------
 
-base_pixels = np.zeros(shape=(PIXEL_COUNT, 3), dtype=np.uint8)
-shown_pixels = np.zeros(shape=(PIXEL_COUNT, 3), dtype=np.uint8)
+class FrameClock:
+    """Frame deadlines on the monotonic clock.
+
+    Each deadline is one period after the previous one, so the time spent on
+    a frame doesn't stretch the period. When frames are late, up to
+    max_catch_up missed periods are made up and the rest are skipped.
+    Lateness past each deadline is reported as jitter.
+    """
+
+    def __init__(self, max_catch_up=4, report_seconds=5):
+        self.max_catch_up = max_catch_up
+        self.report_seconds = report_seconds
+
+        self.frames = 0
+        self.frames_skipped = 0
+
+        # Seconds late for each frame since the last report
+        self.jitter = []
+        self.jitter_mean = 0
+        self.jitter_max = 0
+
+        self.reset()
+
+    def reset(self):
+        self.deadline = time.monotonic()
+        self._report_time = self.deadline
+        self._report_frames = self.frames
+
+    def wait(self, period):
+        """Sleeps until the next deadline. Returns the number of periods to
+        advance (more than 1 when catching up)."""
+        self.deadline += period
+        now = time.monotonic()
+        steps = 1
+        if now < self.deadline:
+            time.sleep(self.deadline - now)
+            now = time.monotonic()
+        else:
+            missed = int((now - self.deadline) / period)
+            if missed > 0:
+                steps += min(missed, self.max_catch_up)
+                self.frames_skipped += max(0, missed - self.max_catch_up)
+                self.deadline += missed * period
+
+        self.frames += 1
+        self.jitter.append(now - self.deadline)
+
+        elapsed = now - self._report_time
+        if elapsed >= self.report_seconds:
+            jitter = np.array(self.jitter) * 1000
+            self.jitter_mean, self.jitter_max = jitter.mean(), jitter.max()
+            logging.debug(
+                "Animation %.1f frame(s)/sec, jitter %.2f ms (mean) %.2f ms (max), "
+                "%s skipped"
+                % (
+                    (self.frames - self._report_frames) / elapsed,
+                    self.jitter_mean,
+                    self.jitter_max,
+                    self.frames_skipped,
+                )
+            )
+
+            self._report_time = now
+            self._report_frames = self.frames
+            self.jitter = []
+
+        return steps
+
+
+frame_clock = FrameClock()
+
+
+class Renderer:
+    """Computes frames from published controls (animation thread only)"""
+
+    def __init__(self, game_state):
+        self.game_state = game_state
+        self.base_pixels = np.zeros(shape=(game_state.pixel_count, 3), dtype=np.uint8)
+        self.shown_pixels = np.array(self.base_pixels)
+        self.copies = game_state.controls.copies
+
+    def render(self, controls, now, steps=1):
+        """Returns the pixels at now (monotonic seconds), steps periods after
+        the last frame."""
+        if controls.copies != self.copies:
+            # Copy (published with the cleared sums)
+            self.base_pixels = np.array(self.shown_pixels)
+            self.copies = controls.copies
+
+        if controls.playback is not None:
+            frame = controls.playback.frame_at(now - controls.playback_start)
+            if frame is not None:
+                self.shown_pixels = np.array(frame, dtype=np.uint8)
+                return self.shown_pixels
+
+            logging.info("Finished playback")
+            self.game_state.stop_playback(controls.playback)
+
+        # Rolls keep their speed when frames are late
+        for _ in range(steps):
+            self.base_pixels = controls.step(self.base_pixels)
+
+        self.shown_pixels = apply_ops(self.base_pixels, controls.stage_sums)
+        return self.shown_pixels
 
 
 def animation_run():
-    global base_pixels, shown_pixels, ANIMATION_STEP, ANIMATION_DELAY, playing
+    renderer = Renderer(state)
+    shown_pixels = np.array(renderer.shown_pixels)
 
+    frame_clock.reset()
+    steps = 1
     while True:
+        # Stick motion since the last frame, then the same controls for the
+        # whole frame
+        state.apply_axes()
+        controls = state.controls
         try:
-            if playing:
-                if len(record_buffer) > 0:
-                    after_pixels = np.array(record_buffer.pop(), dtype=np.uint8)
-                else:
-                    logging.info("Finished playback")
-                    playing = False
-
-            if not playing:
-                base_pixels = ANIMATION_STEP(base_pixels)
-                after_pixels = apply_ops(base_pixels)
+            # Scheduled time of this frame
+            now = frame_clock.deadline
+            after_pixels = renderer.render(controls, now, steps)
 
             if not np.array_equal(after_pixels, shown_pixels):
                 shown_pixels = after_pixels
                 update_pixels(shown_pixels)
 
-            if recording:
-                record_buffer.append(shown_pixels)
+            if controls.recorder is not None:
+                controls.recorder.add(shown_pixels, now)
         except Exception as e:
             logging.exception("animation_run")
 
-        time.sleep(ANIMATION_DELAY)
+        steps = frame_clock.wait(controls.delay)
 
 
 # -----------------------------------------------------------------------------
 
 
-colorspace_map = {"rgb": sRGBColor, "hsl": HSLColor, "cmy": CMYColor}
-sums = {
-    op_name: {
-        ctrl_name: np.zeros(shape=(PIXEL_COUNT, 3), dtype=int)
-        for ctrl_name in itertools.chain(
-            BUTTONS.values(), AXES.values(), TRIGGERS.values(), HATS.values()
-        )
-    }
-    for op_name in DISCRETE_OPS + CONT_OPS
-}
-
 stages = {
     "rgb": [
         "Red",
@@ -498,184 +639,333 @@ stages = {
 }
 
 
-def wheel(pos):
-    """Returns colors across a color wheel"""
-    if pos < 85:
-        return (pos * 3, 255 - pos * 3, 0)
-    elif pos < 170:
-        pos -= 85
-        return (255 - pos * 3, 0, pos * 3)
-    else:
-        pos -= 170
-        return (0, pos * 3, 255 - pos * 3)
+# Operation name to stage name
+op_stages = {op: stage for stage, stage_ops in stages.items() for op in stage_ops}
+
+# What the animation thread needs from GameState for a frame
+Controls = collections.namedtuple(
+    "Controls",
+    ["stage_sums", "step", "delay", "copies", "recorder", "playback", "playback_start"],
+)
 
 
-# True if alterantive operation is enabled
-alt = False
+class GameState:
+    """Controller state shared by the Pygame, TK, and animation threads.
 
-# True if colors should be in a gradient instead of solid
-gradient = False
+    The input threads (Pygame and TK) change it while holding lock, then
+    publish() a read-only Controls snapshot. The animation thread reads
+    controls, which is replaced whole, so it never sees half of a batch of
+    operations. It only takes the lock to apply_axes() once per frame when
+    stick or trigger values are waiting.
+    """
 
+    def __init__(self, pixel_count):
+        self.pixel_count = pixel_count
+        self.lock = threading.RLock()
 
-def color_sum(op, ctrl_name, dim, on, value=255, alt_value=None):
-    """Fills pixel array for a solid color. Handles alt/gradient variations."""
-    global alt, gradient
-    if alt_value is None:
-        alt_value = -value
+        # Arrays added by each operation and controller (created on first use)
+        self.sums = collections.defaultdict(dict)
 
-    if gradient:
-        if not isinstance(dim, collections.Iterable):
-            dim = [dim]
+        # Running total of sums for each stage, updated by set_sum
+        self.stage_sums = {
+            stage: np.zeros(shape=(pixel_count, 3), dtype=int) for stage in stages
+        }
 
-        # Fill color dimensions independently
-        for d in dim:
-            sums[op][ctrl_name][:, d] = (
-                np.linspace(0, value + 1, PIXEL_COUNT) if on else 0
+        # True if alterantive operation is enabled
+        self.alt = False
+
+        # True if colors should be in a gradient instead of solid
+        self.gradient = False
+
+        # Function called every frame to transform pixels, and the frame delay
+        self.animation_step = ANIMATION_STEP
+        self.animation_delay = ANIMATION_DELAY
+
+        # Counts Copy operations (animation thread copies shown to base pixels)
+        self.copies = 0
+
+        # True if colors are being recorded to a sequence file
+        self.recording = False
+
+        # Streams frames to a temporary file (kept after recording until saved)
+        self.recorder = None
+
+        # Sequence being played back and when it started
+        self.playback = None
+        self.playback_start = 0
+
+        # Latest value of each stick/trigger since the last frame
+        # (name -> (op, value))
+        self._pending_axes = {}
+
+        # Published copies of stage sums (only changed stages are copied)
+        self._published_sums = {}
+        self._changed_stages = set(stages)
+
+        self.controls = None
+        self.publish()
+
+    def publish(self):
+        """Makes changes visible to the animation thread"""
+        with self.lock:
+            for stage in self._changed_stages:
+                stage_sum = self.stage_sums[stage].copy()
+                stage_sum.setflags(write=False)
+                self._published_sums[stage] = stage_sum
+
+            self._changed_stages.clear()
+            self.controls = Controls(
+                stage_sums=dict(self._published_sums),
+                step=self.animation_step,
+                delay=self.animation_delay,
+                copies=self.copies,
+                recorder=self.recorder if self.recording else None,
+                playback=self.playback,
+                playback_start=self.playback_start,
             )
-    else:
-        sums[op][ctrl_name][:, dim] = (alt_value if alt else value) if on else 0
-
-
-def do_discrete_op(ctrl_name, op, on=True):
-    """Perform discrete color transformations."""
-    global base_pixels, shown_pixels, alt, gradient, ANIMATION_STEP, ANIMATION_DELAY, recording
-
-    if op == "Alt":
-        # Do alternatve operation
-        alt = on
-    elif op == "Gradient":
-        # Do color gradients
-        gradient = on
-    elif op == "Red":
-        color_sum(op, ctrl_name, 0, on)
-    elif op == "Green":
-        color_sum(op, ctrl_name, 1, on)
-    elif op == "Blue":
-        color_sum(op, ctrl_name, 2, on)
-    elif op == "Yellow":
-        color_sum(op, ctrl_name, [0, 1], on)
-    elif op == "Orange":
-        color_sum(op, ctrl_name, 0, on)
-        color_sum(op, ctrl_name, 1, on, 128)
-    elif op == "Indigo":
-        color_sum(op, ctrl_name, [1, 2], on)
-    elif op == "Violet":
-        color_sum(op, ctrl_name, [0, 2], on)
-    elif op == "Violet":
-        color_sum(op, ctrl_name, 0, on)
-        color_sum(op, ctrl_name, 2, on, 128)
-    elif op == "Bright":
-        color_sum(op, ctrl_name, 2, on, 50, 100)
-    elif op == "Dark":
-        color_sum(op, ctrl_name, 2, on, -50, -100)
-    elif op == "White":
-        color_sum(op, ctrl_name, [0, 1, 2], on, 255)
-    elif op == "Black":
-        color_sum(op, ctrl_name, [0, 1, 2], on, -255)
-    elif op == "Rainbow":
-        rainbow_array = sums[op][ctrl_name]
-        for i in range(PIXEL_COUNT):
-            rainbow_array[i, :] = wheel(int(i * (256 / PIXEL_COUNT))) if on else 0
-            if alt:
-                rainbow_array[i, :] = np.roll(rainbow_array[i, :], shift=2)
-    elif op == "One":
-        sums[op][ctrl_name][:, :] = -255 if on else 0
-        sums[op][ctrl_name][0, :] = 0
-    elif op == "Odds":
-        sums[op][ctrl_name][:, :] = -255 if on else 0
-        sums[op][ctrl_name][::2, :] = 0
-    elif op == "Evens":
-        sums[op][ctrl_name][:, :] = 0
-        sums[op][ctrl_name][::2, :] = -255 if on else 0
-    elif op == "Copy" and on:
-        base_pixels = np.array(shown_pixels)
-
-        # Reset all sums
-        for ctrl_arrays in sums.values():
-            for ctrl_array in ctrl_arrays.values():
-                ctrl_array[:, :] = 0
-    elif op == "Record" and on:
-        recording = not recording
-        if recording:
-            playing = False
-            record_buffer = []
-            logging.info("Started recording")
-        else:
-            logging.info("Stopped recording")
-
-
-def do_cont_op(ctrl_name, op, value):
-    """Perform continuous color transformations."""
-    global ANIMATION_STEP, ANIMATION_DELAY
-
-    if op == "Light":
-        sums[op][ctrl_name][:, 2] = 255 * value
-    elif op == "Hue":
-        sums[op][ctrl_name][:, 0] = 255 * value
-    elif op == "Red":
-        sums[op][ctrl_name][:, 0] = 255 * value
-    elif op == "Green":
-        sums[op][ctrl_name][:, 1] = 255 * value
-    elif op == "Blue":
-        sums[op][ctrl_name][:, 2] = 255 * value
-    elif op == "Roll":
-        if (value < -0.05) or (value > 0.05):
-            roll = -1 if value < 0 else 1
-            ANIMATION_STEP = lambda x: np.roll(x, roll, axis=0)
-            ANIMATION_DELAY = 0.01 + ((0.1 - 0.01) * (1 - np.abs(value)))
-        else:
-            ANIMATION_STEP = lambda x: x
-            ANIMATION_DELAY = 0.05
-    elif op == "RollL":
-        if value > 0.05:
-            ANIMATION_STEP = lambda x: np.roll(x, -1, axis=0)
-            ANIMATION_DELAY = 0.01 + ((0.1 - 0.01) * (1 - value))
-        else:
-            ANIMATION_STEP = lambda x: x
-            ANIMATION_DELAY = 0.05
-    elif op == "RollR":
-        if value > 0.05:
-            ANIMATION_STEP = lambda x: np.roll(x, 1, axis=0)
-            ANIMATION_DELAY = 0.01 + ((0.1 - 0.01) * (1 - value))
+
+    def set_axis(self, ctrl_name, op, value):
+        """Keeps the latest value of a continuous control for apply_axes()"""
+        with self.lock:
+            self._pending_axes[ctrl_name] = (op, value)
+
+    def apply_axes(self):
+        """Does the continuous operations for the axis values set since the
+        last call and publishes them (once per frame)."""
+        if not self._pending_axes:
+            return
+
+        with self.lock:
+            pending, self._pending_axes = self._pending_axes, {}
+            for ctrl_name, (op, value) in pending.items():
+                self.do_cont_op(ctrl_name, op, value)
+
+            self.publish()
+
+    # -------------------------------------------------------------------------
+
+    def set_sum(self, op, ctrl_name, index, value):
+        """Sets part of the array for an operation/controller and updates the
+        running stage total by the difference."""
+        ctrl_array = self.sums[op].get(ctrl_name)
+        if ctrl_array is None:
+            ctrl_array = np.zeros(shape=(self.pixel_count, 3), dtype=int)
+            self.sums[op][ctrl_name] = ctrl_array
+
+        stage = op_stages.get(op)
+        stage_sum = self.stage_sums.get(stage)
+        if stage_sum is not None:
+            stage_sum[index] -= ctrl_array[index]
+            self._changed_stages.add(stage)
+
+        ctrl_array[index] = value
+
+        if stage_sum is not None:
+            stage_sum[index] += ctrl_array[index]
+
+    def reset_sums(self):
+        """Zeroes all operation/controller arrays and stage totals."""
+        self.sums.clear()
+        for stage_sum in self.stage_sums.values():
+            stage_sum[:, :] = 0
+
+        self._changed_stages.update(self.stage_sums)
+
+    def color_sum(self, op, ctrl_name, dim, on, value=255, alt_value=None):
+        """Fills pixel array for a solid color. Handles alt/gradient variations."""
+        if alt_value is None:
+            alt_value = -value
+
+        if self.gradient:
+            if not isinstance(dim, collections.abc.Iterable):
+                dim = [dim]
+
+            # Fill color dimensions independently
+            for d in dim:
+                self.set_sum(
+                    op,
+                    ctrl_name,
+                    np.s_[:, d],
+                    np.linspace(0, value + 1, self.pixel_count) if on else 0,
+                )
         else:
-            ANIMATION_STEP = lambda x: x
-            ANIMATION_DELAY = 0.05
+            self.set_sum(
+                op,
+                ctrl_name,
+                np.s_[:, dim],
+                (alt_value if self.alt else value) if on else 0,
+            )
+
+    def do_discrete_op(self, ctrl_name, op, on=True):
+        """Perform discrete color transformations (publish() to show them)."""
+        with self.lock:
+            if op == "Alt":
+                # Do alternatve operation
+                self.alt = on
+            elif op == "Gradient":
+                # Do color gradients
+                self.gradient = on
+            elif op == "Red":
+                self.color_sum(op, ctrl_name, 0, on)
+            elif op == "Green":
+                self.color_sum(op, ctrl_name, 1, on)
+            elif op == "Blue":
+                self.color_sum(op, ctrl_name, 2, on)
+            elif op == "Yellow":
+                self.color_sum(op, ctrl_name, [0, 1], on)
+            elif op == "Orange":
+                self.color_sum(op, ctrl_name, 0, on)
+                self.color_sum(op, ctrl_name, 1, on, 128)
+            elif op == "Indigo":
+                self.color_sum(op, ctrl_name, [1, 2], on)
+            elif op == "Violet":
+                self.color_sum(op, ctrl_name, [0, 2], on)
+            elif op == "Violet":
+                self.color_sum(op, ctrl_name, 0, on)
+                self.color_sum(op, ctrl_name, 2, on, 128)
+            elif op == "Bright":
+                self.color_sum(op, ctrl_name, 2, on, 50, 100)
+            elif op == "Dark":
+                self.color_sum(op, ctrl_name, 2, on, -50, -100)
+            elif op == "White":
+                self.color_sum(op, ctrl_name, [0, 1, 2], on, 255)
+            elif op == "Black":
+                self.color_sum(op, ctrl_name, [0, 1, 2], on, -255)
+            elif op == "Rainbow":
+                rainbow_array = np.zeros(shape=(self.pixel_count, 3), dtype=int)
+                if on:
+                    rainbow_array[:, :] = patterns.render("rainbow", self.pixel_count)
+                    if self.alt:
+                        rainbow_array = np.roll(rainbow_array, shift=2, axis=1)
+
+                self.set_sum(op, ctrl_name, np.s_[:, :], rainbow_array)
+            elif op == "One":
+                self.set_sum(op, ctrl_name, np.s_[:, :], -255 if on else 0)
+                self.set_sum(op, ctrl_name, np.s_[0, :], 0)
+            elif op == "Odds":
+                self.set_sum(op, ctrl_name, np.s_[:, :], -255 if on else 0)
+                self.set_sum(op, ctrl_name, np.s_[::2, :], 0)
+            elif op == "Evens":
+                self.set_sum(op, ctrl_name, np.s_[:, :], 0)
+                self.set_sum(op, ctrl_name, np.s_[::2, :], -255 if on else 0)
+            elif op == "Copy" and on:
+                # Shown pixels become the base in the same frame the sums clear
+                self.copies += 1
+                self.reset_sums()
+            elif op == "Record" and on:
+                if self.recording:
+                    self.stop_recording()
+                else:
+                    self.start_recording()
+
+    def do_cont_op(self, ctrl_name, op, value):
+        """Perform continuous color transformations (publish() to show them)."""
+        with self.lock:
+            if op == "Light":
+                self.set_sum(op, ctrl_name, np.s_[:, 2], 255 * value)
+            elif op == "Hue":
+                self.set_sum(op, ctrl_name, np.s_[:, 0], 255 * value)
+            elif op == "Red":
+                self.set_sum(op, ctrl_name, np.s_[:, 0], 255 * value)
+            elif op == "Green":
+                self.set_sum(op, ctrl_name, np.s_[:, 1], 255 * value)
+            elif op == "Blue":
+                self.set_sum(op, ctrl_name, np.s_[:, 2], 255 * value)
+            elif op == "Roll":
+                if (value < -0.05) or (value > 0.05):
+                    roll = -1 if value < 0 else 1
+                    self.animation_step = lambda x: np.roll(x, roll, axis=0)
+                    self.animation_delay = 0.01 + (
+                        (0.1 - 0.01) * (1 - np.abs(value))
+                    )
+                else:
+                    self.animation_step = ANIMATION_STEP
+                    self.animation_delay = ANIMATION_DELAY
+            elif op == "RollL":
+                if value > 0.05:
+                    self.animation_step = lambda x: np.roll(x, -1, axis=0)
+                    self.animation_delay = 0.01 + ((0.1 - 0.01) * (1 - value))
+                else:
+                    self.animation_step = ANIMATION_STEP
+                    self.animation_delay = ANIMATION_DELAY
+            elif op == "RollR":
+                if value > 0.05:
+                    self.animation_step = lambda x: np.roll(x, 1, axis=0)
+                    self.animation_delay = 0.01 + ((0.1 - 0.01) * (1 - value))
+                else:
+                    self.animation_step = ANIMATION_STEP
+                    self.animation_delay = ANIMATION_DELAY
+
+    # -------------------------------------------------------------------------
+
+    def start_recording(self):
+        with self.lock:
+            if self.recorder is not None:
+                self.recorder.close()
+                os.remove(self.recorder.path)
+
+            fd, record_path = tempfile.mkstemp(prefix="legacy-", suffix=".seq")
+            os.close(fd)
+
+            # Frames are timestamped, so playback follows changes to the delay
+            self.recorder = sequence.SequenceRecorder(
+                record_path, self.pixel_count, RECORD_SECONDS
+            )
+            self.playback = None
+            self.recording = True
+            logging.info("Started recording to %s" % record_path)
+
+    def stop_recording(self):
+        with self.lock:
+            if self.recording:
+                self.recording = False
+                self.recorder.close()
+                logging.info(
+                    "Stopped recording (%s frame(s), %s written)"
+                    % (self.recorder.frames_added, self.recorder.frames_written)
+                )
+
+    def start_playback(self, playback):
+        with self.lock:
+            self.stop_recording()
+            self.playback = playback
+            self.playback_start = time.monotonic()
+            self.publish()
+
+    def stop_playback(self, playback):
+        """Called by the animation thread when playback has finished"""
+        with self.lock:
+            if self.playback is playback:
+                self.playback = None
+                self.publish()
+
+
+state = GameState(PIXEL_COUNT)
 
 
 # -----------------------------------------------------------------------------
 
 
-def apply_ops(pixels):
+def apply_ops(pixels, stage_sums):
+    # Do RGB operations
     current_rgb = np.array(pixels, dtype=int)
+    current_rgb += stage_sums["rgb"]
+    np.clip(current_rgb, 0, 255, out=current_rgb)
 
-    # Do RGB operations
-    for op in stages["rgb"]:
-        if op in sums:
-            for ctrl_array in sums[op].values():
-                current_rgb += ctrl_array
-
-    try:
-        # Do HSL operations
-        np.clip(current_rgb, 0, 255, out=current_rgb)
-        current_hsl = np.zeros_like(current_rgb)
-        for i in range(PIXEL_COUNT):
-            current_hsl[i, :] = convert_color(
-                sRGBColor(*current_rgb[i]), HSLColor
-            ).get_value_tuple()
-
-        for op in stages["hsl"]:
-            if op in sums:
-                for ctrl_array in sums[op].values():
-                    current_hsl += ctrl_array
-
-        # Convert to RGB finally
-        final_rgb = np.zeros_like(current_hsl)
-        for i in range(PIXEL_COUNT):
-            final_rgb[i, :] = convert_color(
-                HSLColor(*current_hsl[i]), sRGBColor
-            ).get_value_tuple()
-    except Exception as e:
-        logging.exception("update_pixels")
+    hsl_sum = stage_sums["hsl"]
+    if hsl_sum.any():
+        try:
+            # Do HSL operations on the whole strip at once
+            current_hsl = colorspace.rgb_to_hsl(current_rgb).astype(int)
+            current_hsl += hsl_sum
+
+            # Convert to RGB finally
+            final_rgb = colorspace.hsl_to_rgb(current_hsl).astype(int)
+        except Exception as e:
+            logging.exception("update_pixels")
+            final_rgb = current_rgb
+    else:
+        # No HSL operations are active
         final_rgb = current_rgb
 
     # Final clipping
@@ -685,33 +975,24 @@ def apply_ops(pixels):
 
 
 if args.no_pi:
-    # Use web server
-    def update_pixels(pixels):
-        pixels_json = [
-            [int(pixels[i, 0]), int(pixels[i, 1]), int(pixels[i, 2])]
-            for i in range(PIXEL_COUNT)
-        ]
+    import transport
+
+    # Use web server (newest frame only, over one connection)
+    sender = transport.SENDERS[args.transport](args.server)
 
-        requests.post("http://localhost:5000/pixels/rgb", json=pixels_json)
+    def update_pixels(pixels):
+        sender.send(pixels)
 
 
 else:
-    import RPi.GPIO as GPIO
-    import Adafruit_WS2801 as WS2801
-    import Adafruit_GPIO.SPI as SPI
+    from spi_pixels import SpiPixelWriter, open_spi
 
     # Hardware address of LED strip (must enable SPI in raspi-config)
-    real_pixels = WS2801.WS2801Pixels(PIXEL_COUNT, spi=SPI.SpiDev(0, 0), gpio=GPIO)
+    spi_writer = SpiPixelWriter(PIXEL_COUNT, open_spi(0, 0))
 
-    # Use actual LED strip
+    # Use actual LED strip (one SPI transfer per frame)
     def update_pixels(pixels):
-        global real_pixels
-        for i in range(PIXEL_COUNT):
-            real_pixels.set_pixel_rgb(
-                i, int(pixels[i, 2]), int(pixels[i, 1]), int(pixels[i, 0])
-            )
-
-        real_pixels.show()
+        spi_writer.write(pixels)
 
 
 # -----------------------------------------------------------------------------
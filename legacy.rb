@@ -162,10 +162,9 @@ module Pixels
         @spi.xfer(txdata: @pixels)
       else
         require 'httparty'
-        require 'json'
         HTTParty.post("http://localhost:5000/pixels/raw?bgr=true",
-                      body: @pixels.to_json,
-                      headers: { "Content-Type": "application/json" })
+                      body: @pixels.pack("C*"),
+                      headers: { "Content-Type": "application/octet-stream" })
       end
     end
   end
@@ -0,0 +1,162 @@
+"""Vectorized LED patterns shared by the server, game GUI, and led-on.
+
+Every pattern is a function of (pixel_count, phase, **params) that returns an
+(pixel_count, 3) uint8 RGB array. Phase is in cycles, so a pattern repeats
+when it goes from 0 to 1.
+"""
+import threading
+import collections
+
+import numpy as np
+
+# -----------------------------------------------------------------------------
+
+# Phases are rounded to this many steps per cycle so animated frames are reused
+PHASE_STEPS = 256
+
+# Bytes of rendered frames kept (least recently used are dropped first), so
+# long strips keep fewer frames
+CACHE_BYTES = 16 * 1024 * 1024
+
+
+def wheel(pos):
+    """Colors across a color wheel for an array of positions (0-255)"""
+    pos = np.asarray(pos, dtype=int)[:, np.newaxis]
+    zero = np.zeros_like(pos)
+
+    return np.select(
+        [pos < 85, pos < 170],
+        [
+            np.hstack([pos * 3, 255 - pos * 3, zero]),
+            np.hstack([255 - (pos - 85) * 3, zero, (pos - 85) * 3]),
+        ],
+        default=np.hstack([zero, (pos - 170) * 3, 255 - (pos - 170) * 3]),
+    )
+
+
+def _to_rgb(values):
+    return np.clip(values, 0, 255).astype(np.uint8)
+
+
+# -----------------------------------------------------------------------------
+
+
+def rainbow(pixel_count, phase=0.0):
+    """Whole color wheel spread across the strip"""
+    positions = (np.arange(pixel_count) * (256 / pixel_count)) + (phase * 256)
+    return _to_rgb(wheel(positions.astype(int) % 256))
+
+
+def gradient(pixel_count, phase=0.0, start=(255, 0, 0), end=(0, 0, 255)):
+    """Linear blend from start to end color, rotated by phase"""
+    t = np.linspace(0, 1, pixel_count)[:, np.newaxis]
+    rgb = ((1 - t) * np.array(start)) + (t * np.array(end))
+    return _to_rgb(np.roll(rgb, int(phase * pixel_count), axis=0))
+
+
+def chase(pixel_count, phase=0.0, color=(255, 255, 255), width=3, spacing=8):
+    """Groups of width lit pixels, spacing apart, moving one spacing per cycle"""
+    offset = int(phase * spacing)
+    lit = ((np.arange(pixel_count) - offset) % spacing) < width
+    return _to_rgb(lit[:, np.newaxis] * np.array(color))
+
+
+def twinkle(pixel_count, phase=0.0, color=(255, 255, 255), density=0.3, seed=0):
+    """A random subset of pixels fading in and out at their own offsets"""
+    rng = np.random.RandomState(seed)
+    offsets = rng.random_sample(pixel_count)
+    active = rng.random_sample(pixel_count) < density
+
+    brightness = np.sin(2 * np.pi * (phase + offsets)).clip(0, 1) ** 2
+    return _to_rgb((brightness * active)[:, np.newaxis] * np.array(color))
+
+
+def fire(pixel_count, phase=0.0, seed=0):
+    """Flickering heat, hottest at pixel 0, colored black-red-yellow-white"""
+    rng = np.random.RandomState(seed)
+    x = np.arange(pixel_count) / pixel_count
+    t = 2 * np.pi * phase
+
+    # Sum of waves at random frequencies (whole numbers so the cycle repeats)
+    flicker = np.zeros(pixel_count)
+    for octave in range(1, 4):
+        speed = rng.randint(1, 4) * octave
+        shift = rng.random_sample() * 2 * np.pi
+        flicker += np.sin((x * 11 * octave) + (speed * t) + shift) / octave
+
+    heat = (1 - x) * (0.75 + (0.25 * flicker / 1.84))
+    heat = heat.clip(0, 1)[:, np.newaxis]
+
+    # Red first, then green, then blue
+    return _to_rgb(255 * (3 * heat - np.array([0, 1, 2])).clip(0, 1))
+
+
+def plasma(pixel_count, phase=0.0):
+    """Overlapping waves mapped onto the color wheel"""
+    x = np.arange(pixel_count) / max(1, pixel_count)
+    t = 2 * np.pi * phase
+
+    value = np.sin((x * 10) + t) + np.sin((x * 17) - (2 * t)) + np.sin((x + 3 * t) * 5)
+    positions = ((value + 3) / 6) * 255
+    return _to_rgb(wheel(positions.astype(int)))
+
+
+PATTERNS = {
+    "rainbow": rainbow,
+    "gradient": gradient,
+    "chase": chase,
+    "twinkle": twinkle,
+    "fire": fire,
+    "plasma": plasma,
+}
+
+# -----------------------------------------------------------------------------
+
+
+# (name, pixel count, phase step, params) -> read-only frame
+_cache = collections.OrderedDict()
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0, "bytes": 0}
+
+
+def _render(name, pixel_count, phase_step, params):
+    key = (name, pixel_count, phase_step, params)
+    with _cache_lock:
+        rgb = _cache.get(key)
+        if rgb is not None:
+            _cache.move_to_end(key)
+            _cache_stats["hits"] += 1
+            return rgb
+
+        _cache_stats["misses"] += 1
+
+    rgb = PATTERNS[name](pixel_count, phase_step / PHASE_STEPS, **dict(params))
+    rgb.setflags(write=False)
+    if rgb.nbytes > CACHE_BYTES:
+        return rgb
+
+    with _cache_lock:
+        if key not in _cache:
+            _cache[key] = rgb
+            _cache_stats["bytes"] += rgb.nbytes
+
+        while _cache_stats["bytes"] > CACHE_BYTES:
+            _, dropped = _cache.popitem(last=False)
+            _cache_stats["bytes"] -= dropped.nbytes
+
+    return rgb
+
+
+def render(name, pixel_count, phase=0.0, **params):
+    """Returns a read-only (pixel_count, 3) frame of a pattern.
+
+    Frames are cached by (name, pixel count, phase step, params), up to
+    CACHE_BYTES. Tuple parameters (colors) must be tuples rather than lists.
+    """
+    phase_step = int(round(phase * PHASE_STEPS)) % PHASE_STEPS
+    return _render(name, pixel_count, phase_step, tuple(sorted(params.items())))
+
+
+def cache_info():
+    with _cache_lock:
+        return dict(_cache_stats, frames=len(_cache), max_bytes=CACHE_BYTES)
@@ -0,0 +1,84 @@
+"""Scheduling of pixel renders (SPI output and WebSocket broadcast)."""
+import time
+import logging
+
+import gevent
+import gevent.event
+
+# -----------------------------------------------------------------------------
+
+
+class RenderScheduler:
+    """Coalesces show requests into at most max_fps renders per second.
+
+    Requests only mark the strip dirty. A greenlet calls render once for all
+    requests made since the last frame. With max_fps <= 0, every request
+    renders immediately.
+    """
+
+    def __init__(self, render, max_fps=60):
+        self.render = render
+        self.max_fps = max_fps
+
+        self.frames_requested = 0
+        self.frames_rendered = 0
+
+        self._dirty = False
+        self._wakeup = gevent.event.Event()
+        self._greenlet = None
+
+    @property
+    def frames_coalesced(self):
+        """Requests that were merged into another frame"""
+        return self.frames_requested - self.frames_rendered - int(self._dirty)
+
+    def stats(self):
+        return {
+            "max_fps": self.max_fps,
+            "frames_requested": self.frames_requested,
+            "frames_rendered": self.frames_rendered,
+            "frames_coalesced": self.frames_coalesced,
+        }
+
+    def start(self):
+        if (self.max_fps > 0) and (self._greenlet is None):
+            self._greenlet = gevent.spawn(self._run)
+
+    def request(self):
+        """Marks the strip dirty so that it's rendered in the next frame"""
+        self.frames_requested += 1
+
+        if self.max_fps > 0:
+            self._dirty = True
+            self._wakeup.set()
+        else:
+            self._render()
+
+    def flush(self):
+        """Renders now if there are requests waiting for the next frame"""
+        if self._dirty:
+            self._render()
+
+    def _render(self):
+        self._dirty = False
+        self.frames_rendered += 1
+        self.render()
+
+    def _run(self):
+        period = 1 / self.max_fps
+        next_time = 0
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+
+            # Wait out the rest of the frame, collecting more requests
+            delay = next_time - time.monotonic()
+            if delay > 0:
+                gevent.sleep(delay)
+
+            if self._dirty:
+                next_time = time.monotonic() + period
+                try:
+                    self._render()
+                except Exception as e:
+                    logging.exception("render")
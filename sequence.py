@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""Light show sequence files that can be memory-mapped and played frame by frame.
+
+Layout (little endian):
+    HEADER: magic, version, pixel count, frame count, seconds per frame
+    frames: frame count records of (hold, rgb), where hold is the number of
+            frame periods the (pixel count, 3) uint8 colors are shown for
+
+The PNG convention used by game_gui.py and bin/led-on.py has one column per
+frame and one row per pixel.
+"""
+import os
+import sys
+import time
+import queue
+import struct
+import logging
+import argparse
+import threading
+
+import numpy as np
+
+# -----------------------------------------------------------------------------
+
+MAGIC = b"LEDSEQ"
+VERSION = 1
+HEADER = struct.Struct("<6sHIId")
+
+# Used when a PNG doesn't say how long its frames are
+DEFAULT_FRAME_SECONDS = 0.05
+
+
+def frame_dtype(pixel_count):
+    return np.dtype([("hold", "<u4"), ("rgb", np.uint8, (pixel_count, 3))])
+
+
+# -----------------------------------------------------------------------------
+
+
+class Sequence:
+    """Memory-mapped sequence file (see open_sequence)"""
+
+    def __init__(self, path):
+        with open(path, "rb") as seq_file:
+            header = seq_file.read(HEADER.size)
+
+        if len(header) < HEADER.size:
+            raise ValueError("Not a sequence file (%s)" % path)
+
+        magic, version, pixel_count, frame_count, frame_seconds = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError("Not a sequence file (%s)" % path)
+
+        if version != VERSION:
+            raise ValueError("Unsupported sequence version %s (%s)" % (version, path))
+
+        self.path = path
+        self.pixel_count = pixel_count
+        self.frame_seconds = frame_seconds
+        if frame_count > 0:
+            self.frames = np.memmap(
+                path,
+                dtype=frame_dtype(pixel_count),
+                mode="r",
+                offset=HEADER.size,
+                shape=(frame_count,),
+            )
+        else:
+            self.frames = np.zeros(shape=(0,), dtype=frame_dtype(pixel_count))
+
+        self._cursor, self._cursor_start = 0, 0
+
+    def __len__(self):
+        return len(self.frames)
+
+    @property
+    def duration(self):
+        return int(np.sum(self.frames["hold"], dtype=np.int64)) * self.frame_seconds
+
+    def frame_at(self, seconds):
+        """Colors shown at some time from the start or None when it's over.
+
+        Steps forward from the last frame returned, so playing in order only
+        touches the frames being shown.
+        """
+        period = int(seconds / self.frame_seconds)
+        if period < self._cursor_start:
+            self._cursor, self._cursor_start = 0, 0
+
+        while self._cursor < len(self.frames):
+            frame = self.frames[self._cursor]
+            hold = int(frame["hold"])
+            if period < self._cursor_start + hold:
+                return frame["rgb"]
+
+            self._cursor += 1
+            self._cursor_start += hold
+
+        return None
+
+    def iter_frames(self):
+        """Yields (start seconds, rgb) for each frame without reading ahead"""
+        period = 0
+        for frame in self.frames:
+            yield (period * self.frame_seconds, frame["rgb"])
+            period += int(frame["hold"])
+
+    def to_array(self, frame_seconds=None):
+        """(frame periods, pixel count, 3) array with held frames repeated.
+
+        With frame_seconds, the frames are instead sampled at the middle of
+        each period of that length.
+        """
+        if (frame_seconds is None) or (frame_seconds == self.frame_seconds):
+            return np.repeat(self.frames["rgb"], self.frames["hold"], axis=0)
+
+        ends = np.cumsum(self.frames["hold"], dtype=np.int64) * self.frame_seconds
+        periods = np.arange(int(round(self.duration / frame_seconds)))
+        times = (periods + 0.5) * frame_seconds
+        return self.frames["rgb"][np.searchsorted(ends, times, side="right")]
+
+
+def open_sequence(path):
+    return Sequence(path)
+
+
+class SequenceWriter:
+    """Appends frames to a new sequence file.
+
+    The frame count in the header is updated by flush() and close(), so the
+    file is readable while it is still being written.
+    """
+
+    def __init__(self, path, pixel_count, frame_seconds=DEFAULT_FRAME_SECONDS):
+        self.path = path
+        self.pixel_count = pixel_count
+        self.frame_seconds = frame_seconds
+        self.frame_count = 0
+
+        self._file = open(path, "wb")
+        self._write_header()
+
+    def _write_header(self):
+        self._file.seek(0)
+        self._file.write(
+            HEADER.pack(
+                MAGIC, VERSION, self.pixel_count, self.frame_count, self.frame_seconds
+            )
+        )
+        self._file.seek(0, os.SEEK_END)
+
+    def write(self, rgb, hold=1):
+        """Appends a (pixel count, 3) frame shown for hold frame periods"""
+        rgb = np.asarray(rgb, dtype=np.uint8)
+        if rgb.shape != (self.pixel_count, 3):
+            raise ValueError(
+                "Expected %s pixels, got shape %s" % (self.pixel_count, rgb.shape)
+            )
+
+        self._file.write(struct.pack("<I", hold))
+        self._file.write(rgb.tobytes())
+        self.frame_count += 1
+
+    def write_frames(self, frames, holds=None):
+        """Appends an (N, pixel count, 3) array of frames at once"""
+        frames = np.asarray(frames, dtype=np.uint8)
+        records = np.empty(shape=(len(frames),), dtype=frame_dtype(self.pixel_count))
+        records["hold"] = 1 if holds is None else holds
+        records["rgb"] = frames
+
+        records.tofile(self._file)
+        self.frame_count += len(frames)
+
+    def flush(self):
+        self._write_header()
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class SequenceRecorder:
+    """Streams frames to a sequence file from a writer thread.
+
+    Frames are copied into a preallocated ring of slots, so memory use doesn't
+    grow with the length of the recording. add() only waits when the writer
+    is a whole ring behind. With dedup, identical consecutive frames are
+    stored once with a longer hold.
+
+    add() and close() may be called from different threads.
+
+    Frames added with a timestamp (time.monotonic() seconds) are held until
+    the next frame's timestamp, rounded to frame_seconds, so playback follows
+    the timing of capture. Without one, each frame is one period.
+    """
+
+    def __init__(
+        self,
+        path,
+        pixel_count,
+        frame_seconds=DEFAULT_FRAME_SECONDS,
+        slots=64,
+        dedup=True,
+        start_time=None,
+    ):
+        self.path = path
+        self.dedup = dedup
+        self.frame_seconds = frame_seconds
+        self.start_time = time.monotonic() if start_time is None else start_time
+        self.frames_added = 0
+        self.closed = False
+
+        self._lock = threading.Lock()
+        self._writer = SequenceWriter(path, pixel_count, frame_seconds)
+        self._ring = np.zeros(shape=(slots, pixel_count, 3), dtype=np.uint8)
+        self._free = queue.Queue()
+        self._full = queue.Queue()
+        for slot in range(slots):
+            self._free.put(slot)
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def frames_written(self):
+        """Frame records in the file so far (fewer than added with dedup)"""
+        return self._writer.frame_count
+
+    def add(self, rgb, timestamp=None):
+        """Queues a copy of a (pixel count, 3) frame shown at timestamp"""
+        with self._lock:
+            if self.closed:
+                return
+
+            if timestamp is None:
+                period = self.frames_added
+            else:
+                period = int(round((timestamp - self.start_time) / self.frame_seconds))
+
+            slot = self._free.get()
+            np.copyto(self._ring[slot], rgb)
+            self._full.put((slot, period))
+            self.frames_added += 1
+
+    def close(self):
+        """Writes the remaining frames and closes the file"""
+        with self._lock:
+            if not self.closed:
+                self.closed = True
+                self._full.put(None)
+
+        self._thread.join()
+
+    def _run(self):
+        last_rgb = np.zeros_like(self._ring[0])
+        last_period, end_period = None, 0
+        try:
+            while True:
+                item = self._full.get()
+                if item is None:
+                    break
+
+                slot, period = item
+                rgb = self._ring[slot]
+                end_period = max(end_period, period + 1)
+                if last_period is None:
+                    np.copyto(last_rgb, rgb)
+                    last_period = period
+                elif self.dedup and np.array_equal(rgb, last_rgb):
+                    pass  # held longer
+                elif period <= last_period:
+                    # Replaced within the same period
+                    np.copyto(last_rgb, rgb)
+                else:
+                    self._writer.write(last_rgb, period - last_period)
+                    np.copyto(last_rgb, rgb)
+                    last_period = period
+
+                self._free.put(slot)
+
+            if last_period is not None:
+                self._writer.write(last_rgb, end_period - last_period)
+        except Exception as e:
+            logging.exception("SequenceRecorder")
+            self.closed = True
+        finally:
+            self._writer.close()
+
+
+def save_sequence(path, frames, frame_seconds=DEFAULT_FRAME_SECONDS):
+    """Writes an (N, pixel count, 3) array of frames to a sequence file"""
+    frames = np.asarray(frames, dtype=np.uint8)
+    with SequenceWriter(path, frames.shape[1], frame_seconds) as writer:
+        writer.write_frames(frames)
+
+
+# -----------------------------------------------------------------------------
+
+
+def read_png_frames(path):
+    """(frames, pixel count, 3) array from a PNG with one column per frame"""
+    from PIL import Image
+
+    image = Image.open(path).convert("RGB")
+    return np.ascontiguousarray(np.swapaxes(np.array(image), 0, 1))
+
+
+def write_png_frames(path, frames):
+    """Saves (frames, pixel count, 3) as a PNG with one column per frame"""
+    from PIL import Image
+
+    frames = np.asarray(frames, dtype=np.uint8)
+    image_rgb = np.ascontiguousarray(np.swapaxes(frames, 0, 1))
+    Image.fromarray(image_rgb, mode="RGB").save(path)
+
+
+def load_frames(path, frame_seconds=DEFAULT_FRAME_SECONDS):
+    """Opens a sequence file or PNG (or other image) as a Sequence-like object"""
+    with open(path, "rb") as in_file:
+        is_sequence = in_file.read(len(MAGIC)) == MAGIC
+
+    if is_sequence:
+        return open_sequence(path)
+
+    return ArraySequence(read_png_frames(path), frame_seconds)
+
+
+class ArraySequence(Sequence):
+    """Sequence held in memory (for images)"""
+
+    def __init__(self, frames, frame_seconds=DEFAULT_FRAME_SECONDS):
+        frames = np.asarray(frames, dtype=np.uint8)
+        self.path = None
+        self.pixel_count = frames.shape[1]
+        self.frame_seconds = frame_seconds
+        self.frames = np.empty(
+            shape=(len(frames),), dtype=frame_dtype(self.pixel_count)
+        )
+        self.frames["hold"] = 1
+        self.frames["rgb"] = frames
+        self._cursor, self._cursor_start = 0, 0
+
+
+# -----------------------------------------------------------------------------
+
+
+def main():
+    parser = argparse.ArgumentParser("sequence.py")
+    subparsers = parser.add_subparsers(dest="command")
+
+    from_png = subparsers.add_parser("from-png", help="Convert PNG to sequence")
+    from_png.add_argument("png", help="Input image (one column per frame)")
+    from_png.add_argument("seq", help="Output sequence file")
+    from_png.add_argument(
+        "--frame-seconds",
+        type=float,
+        default=DEFAULT_FRAME_SECONDS,
+        help="Seconds per frame",
+    )
+
+    to_png = subparsers.add_parser("to-png", help="Convert sequence to PNG")
+    to_png.add_argument("seq", help="Input sequence file")
+    to_png.add_argument("png", help="Output image (one column per frame)")
+
+    info = subparsers.add_parser("info", help="Describe a sequence file")
+    info.add_argument("seq", help="Sequence file")
+
+    args = parser.parse_args()
+
+    if args.command == "from-png":
+        save_sequence(args.seq, read_png_frames(args.png), args.frame_seconds)
+    elif args.command == "to-png":
+        write_png_frames(args.png, open_sequence(args.seq).to_array())
+    elif args.command == "info":
+        seq = open_sequence(args.seq)
+        print(
+            "%s pixel(s), %s frame(s), %s second(s) per frame, %.2f second(s)"
+            % (seq.pixel_count, len(seq), seq.frame_seconds, seq.duration)
+        )
+    else:
+        parser.print_help()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
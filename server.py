@@ -1,35 +1,31 @@
 #!/usr/bin/env python3
+import io
 import os
+import sys
 import time
 import json
 import signal
+import socket
 import argparse
 import shlex
 import logging
-import time
+import contextlib
+import collections
 from uuid import uuid4
+from urllib.parse import parse_qs
 
 logging.basicConfig(level=logging.DEBUG)
 
-import numpy as np
-import gevent
-from flask import Flask, request, jsonify, send_file, send_from_directory
-from flask_sockets import Sockets
-from colormath.color_objects import (
-    LabColor,
-    sRGBColor,
-    LuvColor,
-    XYZColor,
-    HSLColor,
-    HSVColor,
-    CMYColor,
-    IPTColor,
-)
+# Startup step -> seconds (printed with --profile-startup)
+startup_times = collections.OrderedDict()
+
 
-logging.getLogger("colormath.color_conversions").setLevel(logging.WARN)
-from colormath.color_conversions import convert_color
+@contextlib.contextmanager
+def startup_step(name):
+    start_time = time.perf_counter()
+    yield
+    startup_times[name] = time.perf_counter() - start_time
 
-import webcolors
 
 # -----------------------------------------------------------------------------
 
@@ -37,41 +33,149 @@ parser = argparse.ArgumentParser("server.py")
 parser.add_argument("--no-pi", action="store_true", help="Disable LED strip on pi")
 parser.add_argument("--host", default="127.0.0.1", help="Host for server")
 parser.add_argument("--port", default=5000, type=int, help="Port for server")
+parser.add_argument(
+    "--pixel-count", default=32, type=int, help="Number of LEDs (without --strip)"
+)
+parser.add_argument(
+    "--strip",
+    action="append",
+    default=[],
+    help="Named strip as NAME:COUNT[:PORT.DEVICE] (may be repeated)",
+)
+parser.add_argument(
+    "--max-fps",
+    default=60,
+    type=float,
+    help="Maximum frames per second sent to the strip (0 for no limit)",
+)
+parser.add_argument(
+    "--lut-bits",
+    default=0,
+    type=int,
+    choices=range(9),
+    metavar="BITS",
+    help=(
+        "Bits per channel of colorspace lookup tables (1-8, 0 to disable). "
+        "8 is exact; below that the max error for xyz is 73/49/26 LSB at 5/6/7 "
+        "bits and for ipt 37/23/10 LSB, so use 8 for those"
+    ),
+)
+parser.add_argument(
+    "--lut-interpolate",
+    action="store_true",
+    help=(
+        "Interpolate trilinearly between lookup table points, about halving the "
+        "error below 8 bits but slower than the direct math"
+    ),
+)
+parser.add_argument(
+    "--lut-dir", default="lut", help="Directory to cache colorspace lookup tables"
+)
+parser.add_argument(
+    "--channel-order", default="bgr", help="Order of color bytes sent to the strip"
+)
+parser.add_argument(
+    "--gamma", default=1.0, type=float, help="Gamma correction of strip output"
+)
+parser.add_argument(
+    "--no-render-thread",
+    dest="render_thread",
+    action="store_false",
+    help="Convert and send frames in the gevent hub instead of a thread",
+)
+parser.add_argument(
+    "--profile-startup",
+    action="store_true",
+    help="Print how long each startup step took",
+)
+parser.add_argument(
+    "--fake-spi",
+    action="store_true",
+    help="Record SPI transfers instead of using /dev/spidev",
+)
 
 args = parser.parse_args()
 logging.debug(args)
 
+if sorted(args.channel_order) != ["b", "g", "r"]:
+    parser.error(
+        "Channel order must be a permutation of rgb (%s)" % args.channel_order
+    )
+
+listener = None
+if __name__ == "__main__":
+    # Connections wait in the backlog until the server is ready
+    with startup_step("bind"):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind((args.host, args.port))
+        listener.listen(128)
+
+with startup_step("numpy"):
+    import numpy as np
+
+with startup_step("gevent"):
+    import gevent
+    import gevent.lock
+    import gevent.threadpool
+
+with startup_step("flask"):
+    from flask import Flask, request, jsonify, send_file, send_from_directory, abort
+    from flask_sockets import Sockets
+
+with startup_step("local modules"):
+    import colorspace
+    import patterns
+    import delta
+    from strips import parse_strips, group_by_device
+    from broadcast import FrameBroadcaster
+    from render import RenderScheduler
+    from animation import Animator, Fade, Roll, Cycle, ImagePlayback
+
 # -----------------------------------------------------------------------------
 
-# Number of LEDs on the strip
-PIXEL_COUNT = 32
+# Named strips laid end to end in one pixel array
+try:
+    strips = parse_strips(args.strip, args.pixel_count)
+except ValueError as e:
+    parser.error(str(e))
+
+strips_by_name = {strip.name: strip for strip in strips}
+logging.debug(strips)
 
 if args.no_pi:
 
     class FakePixels:
-        def __init__(self, pixel_count=PIXEL_COUNT):
+        def __init__(self, pixel_count):
             self.pixel_count = pixel_count
             self.rgb = np.zeros(shape=(self.pixel_count, 3), dtype=np.uint8)
             self.rgb_show = np.zeros(shape=(self.pixel_count, 3), dtype=np.uint8)
-            self.source_color = sRGBColor
+            # Source colorspace and its lookup table (replaced together)
+            self.conversion = ("rgb", None)
+
+            # Snapshot of rgb and second output buffer for the render thread
+            self.rgb_front = np.zeros_like(self.rgb)
+            self.rgb_show_back = np.zeros_like(self.rgb_show)
 
         def clear(self):
             self.rgb[:, :] = 0
 
         def show(self):
-            for i in range(self.pixel_count):
-                r, g, b, = self.rgb[i, :]
-
-                # Convert color
-                target_color = convert_color(
-                    self.source_color(r / 255, g / 255, b / 255), sRGBColor
-                )
-                r, g, b, = (
-                    max(min(int(v * 255), 255), 0)
-                    for v in target_color.get_value_tuple()
-                )
+            self.swap()
+            self.flush()
+
+        def swap(self):
+            """Takes a snapshot of the colors for the next flush"""
+            np.copyto(self.rgb_front, self.rgb)
+
+        def flush(self):
+            """Converts the snapshot (safe to call from another thread)"""
+            source_color, lut = self.conversion
+            colorspace.to_srgb(
+                self.rgb_front, source_color, out=self.rgb_show_back, lut=lut
+            )
 
-                self.rgb_show[i, :] = (r, g, b)
+            self.rgb_show, self.rgb_show_back = self.rgb_show_back, self.rgb_show
 
         def set_pixel_rgb(self, i, b, g, r):
             i = i % self.pixel_count
@@ -84,33 +188,60 @@ if args.no_pi:
             r, g, b = self.rgb_show[i, :]
             return b, g, r
 
-    pixels = FakePixels(PIXEL_COUNT)
+
 else:
-    import RPi.GPIO as GPIO
-    import Adafruit_WS2801 as WS2801
-    import Adafruit_GPIO.SPI as SPI
+    from spi_pixels import SpiPixelWriter, open_spi
 
     # Hardware address of LED strip (must enable SPI in raspi-config)
     class RealPixels:
-        def __init__(self, pixel_count=PIXEL_COUNT, spi_port=0, spi_device=0):
-            self.pixel_count = pixel_count
+        def __init__(self, strips):
+            self.pixel_count = sum(strip.count for strip in strips)
             self.rgb = np.zeros(shape=(self.pixel_count, 3), dtype=np.uint8)
-            self.source_color = sRGBColor
-            self.real_pixels = WS2801.WS2801Pixels(
-                self.pixel_count, spi=SPI.SpiDev(spi_port, spi_device), gpio=GPIO
-            )
+            self.rgb_show = np.zeros(shape=(self.pixel_count, 3), dtype=np.uint8)
+            # Source colorspace and its lookup table (replaced together)
+            self.conversion = ("rgb", None)
+
+            # Pixel indexes and frame writer for each SPI device
+            self.devices = []
+            devices = group_by_device(strips)
+            for (spi_port, spi_device), device_strips in devices.items():
+                indexes = np.concatenate(
+                    [np.arange(s.range.start, s.range.stop) for s in device_strips]
+                )
+                spi = open_spi(spi_port, spi_device, fake=args.fake_spi)
+                writer = SpiPixelWriter(
+                    len(indexes), spi, order=args.channel_order, gamma=args.gamma
+                )
+                self.devices.append((indexes, writer))
+
+            # Snapshot of rgb and second output buffer for the render thread
+            self.rgb_front = np.zeros_like(self.rgb)
+            self.rgb_show_back = np.zeros_like(self.rgb_show)
 
         def clear(self):
-            for i in range(self.pixel_count):
-                self.set_pixel_rgb(i, 0, 0, 0)
+            self.rgb[:, :] = 0
 
         def show(self):
-            for i in range(self.pixel_count):
-                self.set_pixel_rgb(
-                    i, int(self.rgb[i, 2]), int(self.rgb[i, 1]), int(self.rgb[i, 0])
-                )
+            self.swap()
+            self.flush()
+
+        def swap(self):
+            """Takes a snapshot of the colors for the next flush"""
+            np.copyto(self.rgb_front, self.rgb)
+
+        def flush(self):
+            """Converts the snapshot and sends it to the strip (safe to call from
+            another thread)"""
+            source_color, lut = self.conversion
+            colorspace.to_srgb(
+                self.rgb_front, source_color, out=self.rgb_show_back, lut=lut
+            )
 
-            self.real_pixels.show()
+            # One SPI transfer per device
+            for indexes, writer in self.devices:
+                writer.write(self.rgb_show_back[indexes])
+
+            self.rgb_show, self.rgb_show_back = self.rgb_show_back, self.rgb_show
 
         def set_pixel_rgb(self, i, b, g, r):
             i = i % self.pixel_count
@@ -118,23 +249,21 @@ else:
             self.rgb[i, 1] = g
             self.rgb[i, 2] = b
 
-            # Convert color
-            target_color = convert_color(
-                self.source_color(r / 255, g / 255, b / 255), sRGBColor
-            )
-            r, g, b, = (
-                max(min(int(v * 255), 255), 0) for v in target_color.get_value_tuple()
-            )
-            self.real_pixels.set_pixel_rgb(i, b, g, r)
-
         def get_pixel_rgb(self, i):
-            return self.real_pixels.get_pixel_rgb(i)
+            i = i % self.pixel_count
+            r, g, b = self.rgb_show[i, :]
+            return b, g, r
 
-    pixels = RealPixels(PIXEL_COUNT)
 
-# Turn off the LED strip
-pixels.clear()
-pixels.show()
+# Open the LED strip and turn it off
+with startup_step("pixels"):
+    if args.no_pi:
+        pixels = FakePixels(sum(strip.count for strip in strips))
+    else:
+        pixels = RealPixels(strips)
+
+    pixels.clear()
+    pixels.show()
 
 # -----------------------------------------------------------------------------
 
@@ -143,13 +272,86 @@ app = Flask("legacy-2019")
 app.secret_key = str(uuid4())
 sockets = Sockets(app)
 
-show_event = gevent.event.Event()
+# Shares each shown frame with all WebSocket clients
+broadcaster = FrameBroadcaster()
+broadcaster.publish(pixels.rgb_show)
+
+
+# Colorspace conversion and SPI output run here, outside of the gevent hub
+render_pool = gevent.threadpool.ThreadPool(1)
+
+# Colorspace lookup tables are built here (seconds for 8 bits), so renders and
+# requests keep running
+lut_pool = gevent.threadpool.ThreadPool(1)
+
+# Counts /colorspace requests, so a slow table build for an older request
+# doesn't replace a newer colorspace when it finishes
+colorspace_requests = {"latest": 0}
+
+
+render_lock = gevent.lock.Semaphore()
+
+
+def render_pixels():
+    with render_lock:
+        # Handlers keep writing to pixels.rgb while the snapshot is flushed
+        pixels.swap()
+        if args.render_thread:
+            render_pool.apply(pixels.flush)
+        else:
+            pixels.flush()
+
+        broadcaster.publish(pixels.rgb_show)
+
+
+# Merges all changes between frames into one render
+scheduler = RenderScheduler(render_pixels, max_fps=args.max_fps)
+scheduler.start()
 
 
 def show_pixels():
-    pixels.show()
-    show_event.set()
-    show_event.clear()
+    scheduler.request()
+
+
+def flush_pixels():
+    """Renders pending changes now, so pixels.rgb_show can be read back"""
+    scheduler.flush()
+
+    # Wait for a render that's already in progress
+    with render_lock:
+        pass
+
+
+# Runs fades, rolls, etc. after their requests have returned
+animator = Animator(lambda: pixels.rgb, show_pixels, fps=args.max_fps or 60)
+animator.start()
+
+
+@app.route("/stats", methods=["GET"])
+def api_stats():
+    return jsonify(scheduler.stats())
+
+
+# -----------------------------------------------------------------------------
+
+# Examples:
+# GET /strips -> [{ "name": "main", "start": 0, "count": 32, ... }]
+# POST /pixels?strip=main with [...] -> only pixels of strip "main" are set
+@app.route("/strips", methods=["GET"])
+def api_strips():
+    return jsonify([strip._asdict() for strip in strips])
+
+
+def request_range():
+    """Range of pixels addressed by a request (?strip=name or the whole array)"""
+    name = request.args.get("strip")
+    if name is None:
+        return slice(0, pixels.pixel_count)
+
+    if name not in strips_by_name:
+        abort(404)
+
+    return strips_by_name[name].range
 
 
 # -----------------------------------------------------------------------------
@@ -164,8 +366,11 @@ def show_pixels():
 @app.route("/pixel/<int:index>", methods=["GET", "POST"])
 @app.route("/pixel/<int:index>/<channel>", methods=["GET", "POST"])
 def api_pixel(index, channel=None):
-    # Ensure index is in 0-31
-    index = index % PIXEL_COUNT
+    pixel_range = request_range()
+    strip_rgb = pixels.rgb[pixel_range]
+
+    # Ensure index is on the strip
+    index = index % len(strip_rgb)
 
     if channel:
         channel = channel.lower().strip()
@@ -178,7 +383,8 @@ def api_pixel(index, channel=None):
             except:
                 value = 0
 
-            b, g, r = pixels.get_pixel_rgb(index)
+            # Start from the latest colors (not shown until the next frame)
+            r, g, b = strip_rgb[index].tolist()
 
             if channel == "off":
                 # off
@@ -205,12 +411,13 @@ def api_pixel(index, channel=None):
                 # Set r/g/b of pixel via JSON list
                 r, g, b = value
 
-        pixels.set_pixel_rgb(index, b, g, r)
+        strip_rgb[index, :] = (r, g, b)
         show_pixels()
 
         return "OK"
     else:
-        b, g, r = pixels.get_pixel_rgb(index)
+        flush_pixels()
+        r, g, b = pixels.rgb_show[pixel_range][index].tolist()
 
         if channel:
             values = []
@@ -233,6 +440,14 @@ def api_pixel(index, channel=None):
 # -----------------------------------------------------------------------------
 
 
+def copy_bytes(strip_rgb, data, bgr=False):
+    """Copies raw bytes (3 per pixel) straight into a pixel array"""
+    data = np.frombuffer(data, dtype=np.uint8)
+    count = min(len(data) // 3, len(strip_rgb))
+    data = data[: count * 3].reshape((count, 3))
+    strip_rgb[:count, :] = data[:, ::-1] if bgr else data
+
+
 # Examples:
 # GET /pixels/0 -> [{ "i": 0, "r": 255, "g": 0, "b": 0 }, { "i": 1, "r": 255, "g": 0, "b": 0 }, ...]
 # GET /pixels/0/r -> [255, 0, 0, 0, ...]
@@ -241,99 +456,90 @@ def api_pixel(index, channel=None):
 # POST /pixels/r with [255, 0, 0, ...] -> pixel 0 is red
 # POST /pixels/r with 255 -> all pixels are red
 # POST /pixels/rb with 255 -> all pixels are purple
+# POST /pixels/raw with [255, 0, 0, ...] -> pixel 0 is red
+# POST /pixels/raw with bytes (application/octet-stream) -> 3 bytes per pixel
 @app.route("/pixels", methods=["GET", "POST"])
 @app.route("/pixels/<channel>", methods=["GET", "POST"])
 def api_pixels(channel=None):
     if channel:
         channel = channel.lower().strip()
 
+    pixel_range = request_range()
+    strip_rgb = pixels.rgb[pixel_range]
+    pixel_count = len(strip_rgb)
+
     if request.method == "POST":
+        if (channel == "raw") and (request.mimetype == "application/octet-stream"):
+            bgr = request.args.get("bgr", "false").lower().strip() == "true"
+            copy_bytes(strip_rgb, request.get_data(), bgr)
+
+            show_pixels()
+            return "OK"
+
         data = json.loads(request.data.decode())
         if not isinstance(data, list):
-            data = [int(data)] * PIXEL_COUNT
+            data = [int(data)] * pixel_count
 
         if channel == "raw":
             bgr = request.args.get("bgr", "false").lower().strip() == "true"
-            for i in range(PIXEL_COUNT):
-                i3 = i * 3
-                if bgr:
-                    b, g, r = data[i3 : i3 + 3]
-                else:
-                    r, g, b = data[i3 : i3 + 3]
-                pixels.set_pixel_rgb(i, b, g, r)
+            rgb = np.array(data[: pixel_count * 3], dtype=int).reshape((-1, 3))
+            strip_rgb[: len(rgb), :] = rgb[:, ::-1] if bgr else rgb
         else:
-            for i, value in enumerate(data):
-                b, g, r = pixels.get_pixel_rgb(i)
-
-                if channel:
-                    if channel == "off":
-                        # off
-                        r, g, b = 0, 0, 0
-                    elif channel == "on":
-                        # off
-                        r, g, b = 255, 255, 255
-                    elif isinstance(value, list):
-                        # Set r, g, b
-                        r_idx = channel.find("r")
-                        if r_idx >= 0:
-                            r = value[r_idx]
-
-                        g_idx = channel.find("g")
-                        if g_idx >= 0:
-                            g = value[g_idx]
-
-                        b_idx = channel.find("b")
-                        if b_idx >= 0:
-                            b = value[b_idx]
-                    else:
-                        # Set r, g, b
-                        if "r" in channel:
-                            r = value
+            # Indexes wrap around the strip
+            indexes = np.arange(len(data)) % pixel_count
 
-                        if "g" in channel:
-                            g = value
+            # Start from the latest colors (not shown until the next frame)
+            rgb = strip_rgb[indexes].astype(int)
 
-                        if "b" in channel:
-                            b = value
-                elif isinstance(value, list):
-                    r, g, b, = value
-                else:
-                    r, g, b, = value.get("r", 0), value.get("g", 0), value.get("b", 0)
-                    i = value.get("i", i)
+            if channel == "off":
+                rgb[:, :] = 0
+            elif channel == "on":
+                rgb[:, :] = 255
+            elif (len(data) > 0) and isinstance(data[0], dict):
+                # Set r/g/b (and optionally i) via JSON objects
+                indexes = np.array(
+                    [value.get("i", i) for i, value in enumerate(data)], dtype=int
+                )
+                indexes %= pixel_count
+                rgb = np.array(
+                    [
+                        [value.get("r", 0), value.get("g", 0), value.get("b", 0)]
+                        for value in data
+                    ],
+                    dtype=int,
+                ).reshape((-1, 3))
+            elif channel:
+                # Set listed channels from scalars or lists in channel order
+                values = np.array(data, dtype=int)
+                for column, name in enumerate("rgb"):
+                    position = channel.find(name)
+                    if position >= 0:
+                        rgb[:, column] = (
+                            values[:, position] if values.ndim > 1 else values
+                        )
+            else:
+                rgb = np.array(data, dtype=int).reshape((-1, 3))
 
-                pixels.set_pixel_rgb(i, b, g, r)
+            strip_rgb[indexes] = rgb
 
         show_pixels()
         return "OK"
     else:
-        bgrs = [pixels.get_pixel_rgb(i) for i in range(PIXEL_COUNT)]
+        flush_pixels()
+        rgb = pixels.rgb_show[pixel_range]
 
         if channel:
-            values = []
-            for bgr in bgrs:
-                value = []
-                if "r" in channel:
-                    value.append(bgr[2])
-                if "g" in channel:
-                    value.append(bgr[1])
-                if "b" in channel:
-                    value.append(bgr[0])
+            # Always in r, g, b order
+            columns = [column for column, name in enumerate("rgb") if name in channel]
+            values = rgb[:, columns]
+            if len(columns) == 1:
+                values = values[:, 0]
 
-                if len(value) == 1:
-                    value = value[0]
-
-                values.append(value)
-
-            return jsonify(values)
+            return jsonify(values.tolist())
         else:
             colors = [
-                {
-                    "i": i,
-                    "r": int(bgrs[i][2]),
-                    "g": int(bgrs[i][1]),
-                    "b": int(bgrs[i][0]),
-                }
-                for i in range(PIXEL_COUNT)
+                {"i": i, "r": r, "g": g, "b": b}
+                for i, (r, g, b) in enumerate(rgb.tolist())
             ]
 
             return jsonify(colors)
@@ -349,31 +555,23 @@ def api_color(color, index=None):
     delay = float(request.args.get("delay", 0.05))
 
     color = color.lower().strip()
-    final_rgb = np.array(webcolors.name_to_rgb(color), dtype=np.uint8)
-
-    if index is None:
-        # Set all
-        start_rgb = np.array(pixels.rgb)
-        step_rgb = (final_rgb - start_rgb) / steps
+    import webcolors
 
-        for step in range(steps):
-            pixels.rgb = start_rgb + (step * step_rgb)
-            show_pixels()
-            gevent.sleep(delay)
+    final_rgb = np.array(webcolors.name_to_rgb(color), dtype=np.uint8)
 
-        pixels.rgb[:,] = final_rgb
-        show_pixels()
-    else:
-        start_rgb = np.array(pixels.rgb[index, :])
-        step_rgb = (final_rgb - start_rgb) / steps
+    pixel_range = request_range()
+    if index is not None:
+        # Single pixel on the strip
+        start = pixel_range.start + (index % (pixel_range.stop - pixel_range.start))
+        pixel_range = slice(start, start + 1)
 
-        for step in range(steps):
-            pixels.rgb[index, :] = start_rgb + (step * step_rgb)
-            show_pixels()
-            gevent.sleep(delay)
+    if steps > 1:
+        # Fade in the background
+        fade = Fade(pixel_range, final_rgb, steps=steps, delay=delay)
+        return jsonify({"id": animator.add(fade, request.args.get("id"))})
 
-        pixels.rgb[index, :] = final_rgb
-        show_pixels()
+    pixels.rgb[pixel_range] = final_rgb
+    show_pixels()
 
     return color
 
@@ -381,20 +579,42 @@ def api_color(color, index=None):
 # -----------------------------------------------------------------------------
 
 
-def wheel(pos):
-    if pos < 85:
-        return (pos * 3, 255 - pos * 3, 0)
-    elif pos < 170:
-        pos -= 85
-        return (255 - pos * 3, 0, pos * 3)
-    else:
-        pos -= 170
-        return (0, pos * 3, 255 - pos * 3)
+# Query arguments that aren't pattern parameters
+RESERVED_ARGS = {"strip", "phase", "speed", "duration", "id"}
+
+
+def pattern_params():
+    """Pattern parameters from the query (?width=3&color=red&end=[0,0,255])"""
+    import webcolors
+
+    params = {}
+    for key, value in request.args.items():
+        if key in RESERVED_ARGS:
+            continue
+
+        try:
+            value = json.loads(value)
+        except ValueError:
+            try:
+                value = webcolors.name_to_rgb(value)
+            except ValueError:
+                pass  # plain string
+
+        if isinstance(value, (list, tuple)):
+            value = tuple(int(v) for v in value)
+
+        params[key] = value
+
+    return params
 
 
 # -----------------------------------------------------------------------------
 
 
+# Examples:
+# POST /pattern/rainbow -> colors across a color wheel
+# POST /pattern/chase?phase=0.5&color=red&width=2 -> see patterns.PATTERNS
+# POST /pattern/off -> all pixels off
 @app.route("/pattern", methods=["POST"])
 @app.route("/pattern/<name>", methods=["POST"])
 def pattern(name=None):
@@ -402,11 +622,19 @@ def pattern(name=None):
         name = request.data.decode()
 
     name = name.lower().strip()
-    if name == "rainbow":
-        for i in range(PIXEL_COUNT):
-            pixels.rgb[i, :] = wheel(int(i * (256 / PIXEL_COUNT)))
+    strip_rgb = pixels.rgb[request_range()]
+    pixel_count = len(strip_rgb)
+
+    if name in patterns.PATTERNS:
+        phase = float(request.args.get("phase", 0))
+        try:
+            strip_rgb[:, :] = patterns.render(
+                name, pixel_count, phase, **pattern_params()
+            )
+        except TypeError:
+            abort(400)  # unknown parameter
     elif name == "off":
-        pixels.rgb[:, :] = 0
+        strip_rgb[:, :] = 0
 
     show_pixels()
 
@@ -425,6 +653,8 @@ def op(name=None, count=1, delay=250):
         name = request.data.decode()
 
     name = name.lower().strip()
+    pixel_range = request_range()
+    strip_rgb = pixels.rgb[pixel_range]
     op_func = None
 
     if name == "roll":
@@ -434,43 +664,112 @@ def op(name=None, count=1, delay=250):
             amount = 1
 
         def roll():
-            pixels.rgb[:, 0] = np.roll(pixels.rgb[:, 0], amount)
-            pixels.rgb[:, 1] = np.roll(pixels.rgb[:, 1], amount)
-            pixels.rgb[:, 2] = np.roll(pixels.rgb[:, 2], amount)
+            strip_rgb[:, :] = np.roll(strip_rgb, amount, axis=0)
 
         op_func = roll
 
-    if op_func:
-        delay_sec = delay / 1000
-        for i in range(count):
-            op_func()
-            show_pixels()
-            gevent.sleep(delay_sec)
+    if op_func and (count >= 1):
+        if count > 1:
+            # Repeat in the background
+            roll = Roll(pixel_range, amount, count=count, delay=delay / 1000)
+            return jsonify({"id": animator.add(roll, request.args.get("id"))})
+
+        op_func()
+        show_pixels()
 
     return name
 
 
 # -----------------------------------------------------------------------------
 
-colorspace_map = {
-    # "lab": LabColor,
-    "rgb": sRGBColor,
-    # "luv": LuvColor,
-    "xyz": XYZColor,
-    "hsl": HSLColor,
-    # "hsv": HSVColor,
-    "cmy": CMYColor,
-    "ipt": IPTColor,
-}
+# Examples:
+# POST /color/red?steps=20&delay=0.05 -> { "id": "..." } (fade)
+# POST /op/roll/10/250 with 1 -> { "id": "..." } (roll 10 times)
+# POST /animation/rainbow?speed=0.25 -> { "id": "..." } (cycles per second)
+# POST /animation/fire?duration=10 -> { "id": "..." } (any pattern)
+# POST /animation/image?delay=0.05&loop=true with PNG -> { "id": "..." }
+# POST /animation/rainbow?id=bg -> replaces the animation with id "bg"
+# GET /animations -> { "<id>": { "kind": "fade", "start": 0, "stop": 32 }, ... }
+# DELETE /animation/<id> -> stops one animation
+# DELETE /animations -> stops all animations
+@app.route("/animation/<name>", methods=["POST"])
+def api_animation(name):
+    name = name.lower().strip()
+    pixel_range = request_range()
+    duration = request.args.get("duration")
+    duration = float(duration) if duration is not None else None
+
+    if name in patterns.PATTERNS:
+        speed = float(request.args.get("speed", 0.25))
+        phase = float(request.args.get("phase", 0))
+        params = pattern_params()
+
+        def cycle(pixel_count, elapsed):
+            return patterns.render(
+                name, pixel_count, phase + (elapsed * speed), **params
+            )
+
+        try:
+            cycle(pixel_range.stop - pixel_range.start, 0)
+        except TypeError:
+            abort(400)  # unknown parameter
+
+        animation = Cycle(pixel_range, cycle, duration=duration)
+    elif name == "image":
+        from PIL import Image
+
+        image = Image.open(io.BytesIO(request.get_data())).convert("RGB")
+        animation = ImagePlayback(
+            pixel_range,
+            np.array(image),
+            delay=float(request.args.get("delay", 0.05)),
+            loop=request.args.get("loop", "false").lower().strip() == "true",
+        )
+    else:
+        abort(404)
+
+    return jsonify({"id": animator.add(animation, request.args.get("id"))})
+
+
+@app.route("/animations", methods=["GET", "DELETE"])
+@app.route("/animation/<id>", methods=["DELETE"])
+def api_animations(id=None):
+    if request.method == "GET":
+        return jsonify(animator.describe())
+
+    return jsonify({"stopped": animator.cancel(id)})
+
+
+# -----------------------------------------------------------------------------
 
 
 @app.route("/colorspace", methods=["POST", "GET"])
-def colorspace():
+def api_colorspace():
     if request.method == "GET":
-        return jsonify(colorspace_map.keys())
+        return jsonify(colorspace.COLORSPACES)
 
     name = request.data.decode().strip().lower()
-    pixels.source_color = colorspace_map.get(name, sRGBColor)
+    if name not in colorspace.COLORSPACES:
+        name = "rgb"
+
+    colorspace_requests["latest"] += 1
+    request_number = colorspace_requests["latest"]
+
+    lut = None
+    if args.lut_bits > 0 and name != "rgb":
+        # Precomputed table instead of per-frame math
+        lut = lut_pool.apply(
+            colorspace.load_lut,
+            (name, args.lut_bits, args.lut_dir, args.lut_interpolate),
+        )
+
+    if request_number != colorspace_requests["latest"]:
+        logging.debug("Colorspace %s replaced while its table was built", name)
+        return "OK"
+
+    # One assignment, so a flush never pairs a colorspace with another's table
+    pixels.conversion = (name, lut)
+
     show_pixels()
 
     return "OK"
@@ -497,35 +796,99 @@ def js(filename):
 # -----------------------------------------------------------------------------
 
 
-def send_pixels(ws):
-    bgrs = [pixels.get_pixel_rgb(i) for i in range(PIXEL_COUNT)]
-    colors = [
-        {"i": i, "r": int(bgrs[i][2]), "g": int(bgrs[i][1]), "b": int(bgrs[i][0])}
-        for i in range(PIXEL_COUNT)
-    ]
+# Examples:
+# ws://host/pixels -> [{ "i": 0, "r": 255, "g": 0, "b": 0 }, ...]
+# ws://host/pixels?format=bin -> RGB bytes, 3 per pixel
+# ws://host/pixels?format=bin&header=true -> broadcast.FRAME_HEADER, then RGB bytes
+# ws://host/pixels?format=delta -> keyframe, then changed ranges (see delta.py)
+@sockets.route("/pixels")
+def pixels_ws(ws):
+    query = parse_qs(ws.environ.get("QUERY_STRING", ""))
+    frame_format = query.get("format", ["json"])[0].lower()
+    if frame_format == "bin":
+        if query.get("header", ["false"])[0].lower() == "true":
+            frame_format = "bin_header"
+    elif frame_format != "delta":
+        frame_format = "json"
 
-    ws.send(json.dumps(colors))
+    broadcaster.serve(ws, frame_format)
 
 
-@sockets.route("/pixels")
-def pixels_ws(ws):
-    send_pixels(ws)
+# Examples:
+# ws://host/pixels/push with RGB bytes -> pixels are set, "OK" is sent back
+# ws://host/pixels/push?strip=main&bgr=true with BGR bytes -> only strip "main"
+# ws://host/pixels/push?format=delta with delta.py frames -> "OK" or "keyframe"
+@sockets.route("/pixels/push")
+def pixels_push_ws(ws):
+    query = parse_qs(ws.environ.get("QUERY_STRING", ""))
+    name = query.get("strip", [None])[0]
+    if (name is not None) and (name not in strips_by_name):
+        ws.close()
+        return
+
+    pixel_range = strips_by_name[name].range if name else slice(None)
+    bgr = query.get("bgr", ["false"])[0].lower() == "true"
+    use_delta = query.get("format", ["bin"])[0].lower() == "delta"
+
+    # Last frame number applied (deltas must build on it)
+    last_version = None
+
     while not ws.closed:
-        show_event.wait()
-        send_pixels(ws)
+        data = ws.receive()
+        if data is None:
+            break
+
+        reply = "OK"
+        if isinstance(data, (bytes, bytearray)):
+            if use_delta:
+                try:
+                    kind, version, base_version, ranges = delta.read_frame(data)
+                    if (kind == delta.DELTA) and (base_version != last_version):
+                        # Missed the base frame
+                        reply = "keyframe"
+                    else:
+                        delta.apply_ranges(pixels.rgb[pixel_range], ranges)
+                        last_version = version
+                        show_pixels()
+                except ValueError as e:
+                    # Malformed, so nothing was applied
+                    logging.warning("pixels/push: %s" % e)
+                    last_version = None
+                    reply = "keyframe"
+            else:
+                copy_bytes(pixels.rgb[pixel_range], data, bgr)
+                show_pixels()
+
+        # Reply so the client knows the frame arrived
+        ws.send(reply)
 
 
 # -----------------------------------------------------------------------------
 
 if __name__ == "__main__":
-    from gevent import pywsgi
-    from geventwebsocket.handler import WebSocketHandler
+    with startup_step("websocket handler"):
+        import gevent.socket
+        from gevent import pywsgi
+        from geventwebsocket.handler import WebSocketHandler
 
-    server = pywsgi.WSGIServer(
-        (args.host, args.port), app, handler_class=WebSocketHandler
-    )
+    class NoDelayHandler(WebSocketHandler):
+        def handle(self):
+            # Keep-alive responses aren't held back waiting for delayed ACKs
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            super().handle()
+
+    # gevent needs its own (non-blocking) socket for the bound listener
+    listener = gevent.socket.socket(fileno=listener.detach())
+    server = pywsgi.WSGIServer(listener, app, handler_class=NoDelayHandler)
 
     logging.getLogger("geventwebsocket").setLevel(logging.WARN)
 
+    if args.profile_startup:
+        total = sum(startup_times.values())
+        for name, seconds in startup_times.items():
+            print("%-20s%8.1f ms" % (name, seconds * 1000), file=sys.stderr)
+
+        print("%-20s%8.1f ms" % ("total", total * 1000), file=sys.stderr)
+
     logging.info("Service at http://%s:%s" % (args.host, args.port))
     server.serve_forever()
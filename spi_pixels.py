@@ -0,0 +1,118 @@
+"""Direct SPI output of whole frames to WS2801 LED chains."""
+import time
+import collections
+
+import numpy as np
+
+# -----------------------------------------------------------------------------
+
+# WS2801 latches its data once the clock has been idle for 500us
+LATCH_SECONDS = 0.0005
+
+
+def open_spi(port=0, device=0, clock_hz=1000000, fake=False):
+    """Opens /dev/spidev<port>.<device> for WS2801 output (mode 0, MSB first)"""
+    if fake:
+        spi = FakeSpiDev()
+    else:
+        import spidev
+
+        spi = spidev.SpiDev()
+
+    spi.open(port, device)
+    spi.max_speed_hz = clock_hz
+    spi.mode = 0
+    spi.lsbfirst = False
+
+    return spi
+
+
+def make_gamma_table(gamma=1.0):
+    """Returns a 256 entry uint8 table for gamma correction (None for 1.0)"""
+    if gamma == 1.0:
+        return None
+
+    table = 255 * ((np.arange(256) / 255) ** gamma)
+    return np.round(table).astype(np.uint8)
+
+
+# -----------------------------------------------------------------------------
+
+
+class SpiPixelWriter:
+    """Sends (N, 3) RGB frames to a WS2801 chain in a single SPI transfer.
+
+    Keeps one preallocated byte buffer that is rewritten in place with the
+    channel order and gamma correction applied.
+    """
+
+    def __init__(self, pixel_count, spi, order="bgr", gamma=1.0):
+        if sorted(order) != ["b", "g", "r"]:
+            raise ValueError("Order must be a permutation of rgb (%s)" % order)
+
+        self.pixel_count = pixel_count
+        self.spi = spi
+
+        # Bytes on the wire and an (N, 3) view of them
+        self.buffer = bytearray(pixel_count * 3)
+        self.frame = np.frombuffer(self.buffer, dtype=np.uint8).reshape(
+            (pixel_count, 3)
+        )
+
+        self.channels = ["rgb".index(name) for name in order]
+        self.gamma_table = make_gamma_table(gamma)
+        self._next_write = 0
+
+    def write(self, rgb):
+        """Sends the colors of an (N, 3) uint8 RGB array to the strip"""
+        rgb = np.asarray(rgb, dtype=np.uint8)[:, self.channels]
+        if self.gamma_table is None:
+            self.frame[...] = rgb
+        else:
+            np.take(self.gamma_table, rgb, out=self.frame)
+
+        # Let the previous frame latch first
+        delay = self._next_write - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+        self.spi.writebytes2(self.buffer)
+        self._next_write = time.monotonic() + LATCH_SECONDS
+
+    def clear(self):
+        self.write(np.zeros(shape=(self.pixel_count, 3), dtype=np.uint8))
+
+
+# -----------------------------------------------------------------------------
+
+
+class FakeSpiDev:
+    """Stand-in for spidev.SpiDev that records the most recent transfers"""
+
+    # Transfers kept, so long runs don't grow without bound
+    MAX_TRANSFERS = 16
+
+    def __init__(self):
+        self.port = None
+        self.device = None
+        self.max_speed_hz = 0
+        self.mode = 0
+        self.lsbfirst = False
+        self.transfers = collections.deque(maxlen=self.MAX_TRANSFERS)
+
+    def open(self, port, device):
+        self.port = port
+        self.device = device
+
+    def close(self):
+        pass
+
+    def writebytes2(self, data):
+        self.transfers.append(bytes(data))
+
+    def writebytes(self, data):
+        self.writebytes2(data)
+
+    def xfer(self, data):
+        self.writebytes2(data)
+        return [0] * len(data)
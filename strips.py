@@ -0,0 +1,68 @@
+"""Named strips (segments) of one pixel array."""
+import collections
+
+# -----------------------------------------------------------------------------
+
+
+class Strip(
+    collections.namedtuple(
+        "Strip", ["name", "start", "count", "spi_port", "spi_device"]
+    )
+):
+    """Range of the pixel array that is chained on an SPI device"""
+
+    @property
+    def range(self):
+        return slice(self.start, self.start + self.count)
+
+
+def parse_strips(specs, pixel_count=32):
+    """Lays out strips from NAME:COUNT[:PORT.DEVICE] specs end to end.
+
+    Strips on the same SPI device are chained in the order given. Without any
+    specs, a single "main" strip of pixel_count LEDs on SPI 0.0 is used.
+    Raises ValueError for a malformed spec or a count below 1.
+    """
+    if not specs:
+        if pixel_count < 1:
+            raise ValueError("Pixel count must be at least 1 (%s)" % pixel_count)
+
+        return [Strip("main", 0, pixel_count, 0, 0)]
+
+    strips = []
+    start = 0
+    for spec in specs:
+        try:
+            parts = spec.split(":")
+            if not (2 <= len(parts) <= 3):
+                raise ValueError()
+
+            name, count = parts[0], int(parts[1])
+            spi_port, spi_device = 0, 0
+            if len(parts) > 2:
+                spi_port, spi_device = (int(v) for v in parts[2].split("."))
+        except ValueError:
+            raise ValueError("Expected NAME:COUNT[:PORT.DEVICE] (%s)" % spec)
+
+        if not name:
+            raise ValueError("Strip needs a name (%s)" % spec)
+
+        if count < 1:
+            raise ValueError("Strip count must be at least 1 (%s)" % spec)
+
+        if name in (s.name for s in strips):
+            raise ValueError("Duplicate strip %s" % name)
+
+        strips.append(Strip(name, start, count, spi_port, spi_device))
+        start += count
+
+    return strips
+
+
+def group_by_device(strips):
+    """Returns (spi_port, spi_device) -> strips on that device, in chain order"""
+    devices = collections.OrderedDict()
+    for strip in strips:
+        devices.setdefault((strip.spi_port, strip.spi_device), []).append(strip)
+
+    return devices
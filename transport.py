@@ -0,0 +1,159 @@
+"""Sends pixel frames to server.py over one persistent connection."""
+import time
+import logging
+import threading
+
+import numpy as np
+
+import delta
+
+# -----------------------------------------------------------------------------
+
+
+class FrameSender:
+    """Sends the newest frame from a background thread with send_frame(rgb),
+    which returns after the server's reply.
+
+    send() only replaces the pending frame, so when the server lags, frames
+    that were never sent are dropped instead of queued. Waiting for the reply
+    gives the end-to-end latency.
+    """
+
+    def __init__(self, send_frame, report_seconds=5):
+        self.send_frame = send_frame
+        self.report_seconds = report_seconds
+
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.latencies = []
+
+        self._pending = None
+        self._pending_time = 0
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def send(self, rgb):
+        """Makes a copy of an (N, 3) frame the next one to send"""
+        rgb = np.array(rgb, dtype=np.uint8)
+        with self._condition:
+            if self._pending is not None:
+                self.frames_dropped += 1
+
+            self._pending = rgb
+            self._pending_time = time.perf_counter()
+            self._condition.notify()
+
+    def _run(self):
+        report_time = time.perf_counter()
+        report_sent = 0
+        while True:
+            with self._condition:
+                while self._pending is None:
+                    self._condition.wait()
+
+                rgb, start_time = self._pending, self._pending_time
+                self._pending = None
+
+            try:
+                self.send_frame(rgb)
+                self.frames_sent += 1
+                self.latencies.append(time.perf_counter() - start_time)
+            except Exception as e:
+                logging.exception("FrameSender")
+                time.sleep(1)
+
+            elapsed = time.perf_counter() - report_time
+            if (elapsed >= self.report_seconds) and self.latencies:
+                latencies = np.array(self.latencies) * 1000
+                logging.info(
+                    "Sent %.1f frame(s)/sec, latency %.1f ms (mean) %.1f ms (max), "
+                    "%s dropped"
+                    % (
+                        (self.frames_sent - report_sent) / elapsed,
+                        latencies.mean(),
+                        latencies.max(),
+                        self.frames_dropped,
+                    )
+                )
+
+                report_time = time.perf_counter()
+                report_sent = self.frames_sent
+                self.latencies = []
+
+
+class HttpSender(FrameSender):
+    """POSTs frames to /pixels/raw over a keep-alive session"""
+
+    def __init__(self, url="http://localhost:5000", **kwargs):
+        import requests
+
+        self.url = url.rstrip("/") + "/pixels/raw"
+        self.session = requests.Session()
+        self.session.headers["Content-Type"] = "application/octet-stream"
+        super().__init__(self._post, **kwargs)
+
+    def _post(self, rgb):
+        self.session.post(self.url, data=rgb.tobytes()).raise_for_status()
+
+
+class WebSocketSender(FrameSender):
+    """Pushes binary frames to ws://.../pixels/push (reconnects as needed).
+
+    With use_delta, only the pixel ranges that changed since the last frame
+    the server received are sent, with periodic keyframes.
+    """
+
+    def __init__(self, url="http://localhost:5000", use_delta=True, **kwargs):
+        self.url = url.replace("http", "ws", 1).rstrip("/") + "/pixels/push"
+        self.use_delta = use_delta
+        if use_delta:
+            self.url += "?format=delta"
+
+        self.ws = None
+        self.bytes_sent = 0
+
+        # Last frame the server received (None means send a keyframe)
+        self._base_rgb = None
+        self._version = 0
+        self._since_keyframe = 0
+        super().__init__(self._push, **kwargs)
+
+    def _encode(self, rgb):
+        if not self.use_delta:
+            return rgb.tobytes()
+
+        self._version += 1
+        if (self._base_rgb is None) or (
+            self._since_keyframe >= delta.KEYFRAME_INTERVAL
+        ):
+            self._since_keyframe = 0
+            return delta.encode_keyframe(self._version, rgb)
+
+        self._since_keyframe += 1
+        return delta.encode_delta(
+            self._version, self._version - 1, self._base_rgb, rgb
+        )
+
+    def _push(self, rgb):
+        import websocket
+
+        try:
+            if self.ws is None:
+                self.ws = websocket.create_connection(self.url)
+                self._base_rgb = None
+
+            data = self._encode(rgb)
+            self.ws.send_binary(data)
+            self.bytes_sent += len(data)
+
+            if self.ws.recv() == "keyframe":
+                self._base_rgb = None
+            else:
+                self._base_rgb = rgb
+        except Exception:
+            self.ws = None
+            raise
+
+
+SENDERS = {"http": HttpSender, "websocket": WebSocketSender}